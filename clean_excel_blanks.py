@@ -1,6 +1,9 @@
 import os
 from datetime import datetime
 from openpyxl import load_workbook
+from openpyxl.utils import get_column_letter
+
+from synology_text_metrics import wrapped_line_count
 
 import shutil
 
@@ -55,12 +58,15 @@ def clean_empty_rows(filepath):
             
             # 调整行高（跳过前两行）
             print("  正在调整行高...")
+            col_widths = {}
             for row in sheet.iter_rows(min_row=3):  # 从第三行开始
                 max_lines = 1
                 for cell in row:
                     if cell.value and isinstance(cell.value, str):
-                        # 计算单元格内容行数（每30个字符算一行）
-                        lines = len(cell.value) // 30 + 1
+                        # 按列宽估算单元格内容换行后的行数
+                        if cell.column not in col_widths:
+                            col_widths[cell.column] = sheet.column_dimensions[get_column_letter(cell.column)].width
+                        lines = wrapped_line_count(cell.value, col_widths[cell.column])
                         max_lines = max(max_lines, lines)
                 # 设置行高（每行文字15磅，最小行高15磅）
                 sheet.row_dimensions[row[0].row].height = max(15, max_lines * 15)
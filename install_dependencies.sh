@@ -18,7 +18,7 @@ source venv/bin/activate
 
 # 安装依赖包
 echo "安装依赖包..."
-pip install requests beautifulsoup4 pandas openpyxl pyarrow
+pip install requests beautifulsoup4 pandas openpyxl pyarrow lxml==5.4.0 aiohttp==3.11.18
 
 echo "依赖包安装完成！"
 echo ""
@@ -0,0 +1,344 @@
+"""报价工具的产品目录
+
+build_catalogue() 只打开一次规格文件（openpyxl只读模式），生成：
+- products：产品规格表（工作表名）
+- categories：产品类型 -> 产品系列 -> 型号列表
+- specs：型号 -> {规格项: 规格值}（每个规格项取第一个非空的值）
+- config：产品系列前缀 -> 报价单中列出的参数（来自"规格配置"工作表，没有该工作表时为None）
+
+目录快照以JSON保存在 CATALOGUE_SNAPSHOT_FILE 中，记录规格文件的路径、修改时间、大小和内容哈希。
+规格文件没有变化时 load_snapshot() 直接返回快照，不需要openpyxl；
+只有修改时间变化而内容相同（如复制文件）时，比较哈希后仍使用快照。
+
+get_product_buckets() 是下拉框共用的产品列表缓存：按规格文件的修改时间和大小失效，
+每个产品系列的型号预先排好序，切换产品系列时不需要打开文件。
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+
+from openpyxl import load_workbook
+
+from synology_files import atomic_open
+from synology_xlsx import file_signature, get_sheet_names, iter_sheets
+
+CATALOGUE_SNAPSHOT_FILE = "catalogue_snapshot.json"
+SNAPSHOT_VERSION = 2
+
+# 不是产品规格表的工作表
+NON_PRODUCT_SHEETS = ["产品汇总表", "查询表格", "硬盘分类查询表格", "配件分类查询表格"]
+# 分类查询表格：工作表名 -> 产品类型（每列为一个产品系列，列中为产品型号）
+CATEGORY_SHEETS = {
+    "硬盘分类查询表格": "存储设备",
+    "配件分类查询表格": "配件类",
+}
+# 分类查询表格中不是产品系列的列
+CATEGORY_SHEET_SKIP_COLUMNS = ['产品类型', '产品系列']
+# 规格配置工作表（A列为产品系列前缀，B列为报价单中列出的参数）
+SPEC_CONFIG_SHEET = "规格配置"
+
+# 按型号前缀分类的产品系列：(前缀, 产品类型, 产品系列)，按下拉框中的显示顺序排列
+SERIES_PREFIXES = [
+    ("DS", "NAS设备", "DS系列"),
+    ("RS", "NAS设备", "RS系列"),
+    ("FS", "NAS设备", "FS系列"),
+    ("SA", "NAS设备", "SA系列"),
+    ("UC", "NAS设备", "UC系列"),
+    ("RX", "存储扩充设备", "RX系列"),
+    ("DX", "存储扩充设备", "DX系列"),
+    ("FX", "存储扩充设备", "FX系列"),
+    ("RXD", "存储扩充设备", "RXD系列"),
+    ("E10G", "PCIe扩充卡", "网卡"),
+    ("M2D", "PCIe扩充卡", "M.2转接卡"),
+]
+
+# pd.read_excel 默认视为空值的文字
+NA_STRINGS = frozenset(['', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan',
+                        '1.#IND', '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'])
+
+# 逐个产品的加载信息只在调试级别输出
+logger = logging.getLogger(__name__)
+
+_bucket_cache = {}  # 文件绝对路径 -> ((修改时间, 大小), 产品列表, {产品系列: 排序后的型号列表})
+_bucket_lock = threading.Lock()
+
+def _excel_cell_value(value):
+    """与 pd.read_excel 相同地转换单元格的值，空值返回None"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return None if value in NA_STRINGS else value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+def read_sheet_columns(worksheet):
+    """按 pd.read_excel 的方式读取工作表的各列（第一行为列名）
+
+    返回 {列名: [非空单元格的文字, ...]} 和数据行数。与
+    pd.read_excel(...)[列名].dropna().astype(str).tolist() 的结果相同：
+    没有列名的列命名为 "Unnamed: 序号"，重复的列名加上 ".1"、".2" 后缀，
+    只有数字且有空单元格的列按浮点数转换为文字。
+    """
+    if hasattr(worksheet, 'reset_dimensions'):
+        # 只读模式下工作表记录的尺寸可能不准确
+        worksheet.reset_dimensions()
+
+    rows = []
+    for row in worksheet.iter_rows(values_only=True):
+        row = [_excel_cell_value(value) for value in row]
+        while row and row[-1] is None:
+            row.pop()
+        rows.append(row)
+    while rows and not rows[-1]:
+        rows.pop()
+    if not rows:
+        return {}, 0
+
+    header, data = rows[0], rows[1:]
+    width = max(len(row) for row in rows)
+    columns = {}
+    for index in range(width):
+        name = header[index] if index < len(header) and header[index] is not None else f"Unnamed: {index}"
+        # 重复的列名
+        base, suffix = name, 0
+        while name in columns:
+            suffix += 1
+            name = f"{base}.{suffix}"
+        values = [row[index] if index < len(row) else None for row in data]
+        present = [value for value in values if value is not None]
+        numeric = all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in present)
+        if numeric and (len(present) < len(values) or any(isinstance(value, float) for value in present)):
+            # 含空值的数字列在DataFrame中是浮点数
+            columns[name] = [str(float(value)) for value in present]
+        else:
+            columns[name] = [str(value) for value in present]
+    return columns, len(data)
+
+def classify_products(products):
+    """根据型号前缀把产品分到主要产品类型中，返回 {产品类型: {产品系列: [型号, ...]}}（型号已排序）"""
+    categories = {}
+    for _, category, series in SERIES_PREFIXES:
+        categories.setdefault(category, {})[series] = []
+    # 较长的前缀优先匹配（RXD开头的型号不属于RX系列）
+    by_length = sorted(SERIES_PREFIXES, key=lambda entry: -len(entry[0]))
+    for product in products:
+        for prefix, category, series in by_length:
+            if product.startswith(prefix):
+                categories[category][series].append(product)
+                logger.debug(f"  添加到{series}: {product}")
+                break
+    for subcategories in categories.values():
+        for models in subcategories.values():
+            models.sort()
+    return categories
+
+def _series_buckets(categories):
+    """取出按型号前缀分类的产品系列：{产品系列: [型号, ...]}"""
+    return {series: list(categories[category][series]) for _, category, series in SERIES_PREFIXES}
+
+def get_product_buckets(path):
+    """返回规格文件的 (产品列表, {产品系列: 排序后的型号列表})
+
+    按文件的修改时间和大小缓存；文件变化后只读取工作表目录（xl/workbook.xml）重新分类。
+    文件不存在时抛出 FileNotFoundError。
+    """
+    key = os.path.abspath(path)
+    signature = file_signature(path)
+    with _bucket_lock:
+        cached = _bucket_cache.get(key)
+    if cached and cached[0] == signature:
+        return cached[1], cached[2]
+
+    products = [name for name in get_sheet_names(path) if name not in NON_PRODUCT_SHEETS]
+    buckets = _series_buckets(classify_products(products))
+    with _bucket_lock:
+        _bucket_cache[key] = (signature, products, buckets)
+    return products, buckets
+
+def prime_product_buckets(catalogue):
+    """用目录中的产品分类填充 get_product_buckets 的缓存（目录与规格文件一致时）"""
+    source = catalogue['source']
+    signature = (source['mtime_ns'], source['size'])
+    try:
+        if file_signature(source['path']) != signature:
+            return
+    except OSError:
+        return
+    with _bucket_lock:
+        _bucket_cache[source['path']] = (signature, list(catalogue['products']),
+                                         _series_buckets(catalogue['categories']))
+
+def _read_category_sheet(wb, sheet_name, category, categories):
+    """读取分类查询表格：每列（'产品类型'、'产品系列'列除外）为一个产品系列，列中为产品型号"""
+    if sheet_name not in wb.sheetnames:
+        raise ValueError(f"未找到工作表 '{sheet_name}'")
+    columns, row_count = read_sheet_columns(wb[sheet_name])
+    if not row_count:
+        return
+
+    # 从列名中获取产品系列
+    series_list = [col for col in columns if col not in CATEGORY_SHEET_SKIP_COLUMNS]
+    if not series_list:
+        return
+    categories[category] = {series: [] for series in series_list}
+    print(f"添加{category}系列: {series_list}")
+
+    # 获取每列中非空的单元格内容作为产品型号
+    for series in series_list:
+        # 过滤掉空字符串和只包含空格的字符串
+        models = [model.strip() for model in columns[series] if model.strip()]
+        if models:
+            categories[category][series] = models
+            logger.debug(f"  添加{category}型号到{series}: {models}")
+
+def read_spec_items(rows):
+    """由产品规格表的各行（值的元组）生成 {规格项: 规格值}
+
+    规格项在B列、规格值在C列；同一规格项出现多次时取第一个非空的值。
+    """
+    specs = {}
+    for row in rows:
+        if len(row) > 2 and row[1] and row[2]:
+            item = str(row[1]).strip()
+            if item not in specs:
+                specs[item] = str(row[2]).strip()
+    return specs
+
+def read_spec_config(rows):
+    """由规格配置工作表的各行（值的元组）生成 {产品系列前缀: [参数, ...]}
+
+    A列为产品系列前缀，B列为逗号分隔的参数；同一前缀有多行时使用第一行有参数的配置。
+    """
+    config = {}
+    for row in rows:
+        if row and row[0] and len(row) > 1 and row[1]:
+            prefix = str(row[0]).strip()
+            if prefix not in config:
+                config[prefix] = [p.strip() for p in str(row[1]).split(',') if p.strip()]
+    return config
+
+def _sheet_rows(cells):
+    """把 synology_xlsx 读取的单元格转换为各行值的元组列表"""
+    rows = {}
+    for (row, col), cell in cells.items():
+        rows.setdefault(row, {})[col] = cell.value
+    return [tuple(values.get(col) for col in range(1, max(values) + 1))
+            for _, values in sorted(rows.items())]
+
+def iter_product_entries(path, products):
+    """直接从规格文件读取规格配置和多个产品的规格（目录还不可用或已过期时使用）
+
+    规格文件只打开一次，规格配置和共享字符串只读取一次，之后逐个流式读取产品规格表，
+    不用openpyxl加载整个工作簿。逐个生成 (产品, 规格配置或None, {规格项: 规格值}或None)。
+    """
+    sheets = iter_sheets(path, [SPEC_CONFIG_SHEET] + [p for p in products if p != SPEC_CONFIG_SHEET])
+    config_cells = next(sheets)[1]
+    config = read_spec_config(_sheet_rows(config_cells)) if config_cells is not None else None
+    for product, cells in sheets:
+        yield product, config, read_spec_items(_sheet_rows(cells)) if cells is not None else None
+    if SPEC_CONFIG_SHEET in products:
+        # 规格配置工作表不是产品
+        yield SPEC_CONFIG_SHEET, config, None
+
+def read_product_entry(path, product):
+    """读取规格配置和一个产品的规格，返回 (规格配置或None, {规格项: 规格值}或None)"""
+    _, config, specs = next(iter_product_entries(path, [product]))
+    return config, specs
+
+def file_hash(path):
+    """文件内容的SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def build_catalogue(path, with_specs=True):
+    """读取规格文件，生成产品目录
+
+    with_specs 为False时不读取各产品规格表（specs为None），只需要工作表名和分类查询表格。
+    """
+    # 先记录文件状态，读取期间文件被修改时下次会重新生成
+    signature = file_signature(path)
+    digest = file_hash(path)
+    wb = load_workbook(path, read_only=True)
+    try:
+        products = [sheet for sheet in wb.sheetnames if sheet not in NON_PRODUCT_SHEETS]
+        print(f"找到 {len(products)} 个产品规格表")
+
+        print("\n正在根据产品型号前缀分类主要产品...")
+        categories = classify_products(products)
+
+        # 从硬盘分类查询表格、配件分类查询表格读取存储设备和配件类分类
+        for sheet_name, category in CATEGORY_SHEETS.items():
+            print(f"\n正在从{sheet_name}读取{category}分类...")
+            try:
+                _read_category_sheet(wb, sheet_name, category, categories)
+            except Exception as e:
+                print(f"读取{sheet_name}时出错：{str(e)}")
+
+        # 对分类查询表格中的产品型号进行排序
+        for category in CATEGORY_SHEETS.values():
+            for models in categories.get(category, {}).values():
+                models.sort()
+
+        config = None
+        if SPEC_CONFIG_SHEET in wb.sheetnames:
+            config = read_spec_config(wb[SPEC_CONFIG_SHEET].iter_rows(values_only=True))
+
+        specs = None
+        if with_specs:
+            specs = {}
+            for product in products:
+                if product != SPEC_CONFIG_SHEET:
+                    specs[product] = read_spec_items(wb[product].iter_rows(values_only=True))
+    finally:
+        wb.close()
+
+    return {
+        'version': SNAPSHOT_VERSION,
+        'source': {'path': os.path.abspath(path), 'mtime_ns': signature[0], 'size': signature[1],
+                   'sha256': digest},
+        'products': products,
+        'categories': categories,
+        'specs': specs,
+        'config': config,
+    }
+
+def save_snapshot(catalogue, snapshot_file=None):
+    """保存目录快照（先写临时文件再替换）"""
+    snapshot_file = snapshot_file or CATALOGUE_SNAPSHOT_FILE
+    with atomic_open(snapshot_file, 'w', encoding='utf-8') as f:
+        json.dump(catalogue, f, ensure_ascii=False)
+
+def load_snapshot(path, snapshot_file=None):
+    """读取规格文件的目录快照
+
+    返回 (目录, 是否有效)：没有快照时返回 (None, False)；
+    快照属于这个规格文件但文件已经变化时返回 (旧目录, False)，可以先使用再在后台重建。
+    """
+    snapshot_file = snapshot_file or CATALOGUE_SNAPSHOT_FILE
+    try:
+        with open(snapshot_file, encoding='utf-8') as f:
+            catalogue = json.load(f)
+    except (OSError, ValueError):
+        return None, False
+    source = catalogue.get('source') or {}
+    if catalogue.get('version') != SNAPSHOT_VERSION or source.get('path') != os.path.abspath(path):
+        return None, False
+
+    mtime_ns, size = file_signature(path)
+    if (source.get('mtime_ns'), source.get('size')) == (mtime_ns, size):
+        return catalogue, True
+    # 修改时间变化但内容相同时更新快照中的记录
+    if source.get('size') == size and source.get('sha256') == file_hash(path):
+        source['mtime_ns'] = mtime_ns
+        try:
+            save_snapshot(catalogue, snapshot_file)
+        except OSError as e:
+            print(f"更新目录快照失败：{str(e)}")
+        return catalogue, True
+    return catalogue, False
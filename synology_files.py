@@ -0,0 +1,37 @@
+"""文件写入工具
+
+缓存、索引、快照和工作簿都用 atomic_open()/write_atomic() 保存：先写入同一目录下的临时文件，
+写完后用 os.replace 替换目标文件。读取方不会看到写了一半的文件，写入出错时原文件保持不变。
+临时文件名包含进程号和线程号，多个进程或线程同时保存同一个文件时不会共用临时文件。
+"""
+import os
+import threading
+from contextlib import contextmanager
+
+def _temp_path(path):
+    """path 对应的临时文件路径（同一目录，每个进程、线程各不相同）"""
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+@contextmanager
+def atomic_open(path, mode='wb', **kwargs):
+    """打开 path 的临时文件用于写入
+
+    with 块正常结束后用临时文件替换 path；块中出现异常时删除临时文件，path 不变。
+    mode 和其他参数与 open() 相同（只能是写入模式）。
+    """
+    tmp_path = _temp_path(path)
+    try:
+        with open(tmp_path, mode, **kwargs) as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+def write_atomic(path, data):
+    """把字节数据写入 path（先写临时文件再替换）"""
+    with atomic_open(path) as f:
+        f.write(data)
@@ -0,0 +1,333 @@
+"""群晖官网HTTP访问层
+
+所有访问 synology.cn 的请求（规格页面、产品图片）都通过本模块的共享会话发出：
+- 复用连接池中的TCP/TLS连接（keep-alive），避免每个请求重新握手
+- 协商gzip/deflate压缩（安装了brotli时同时支持br）
+- 每个请求都带有连接/读取超时
+- 默认User-Agent可通过环境变量 SYNOLOGY_USER_AGENT 或 set_user_agent() 修改
+- cached_get() 把响应缓存到磁盘，再次请求时用ETag/Last-Modified做条件请求，
+  服务器返回304时直接使用缓存内容
+
+批量刷新整个产品目录时，cached_get_async() 用 aiohttp 在事件循环中发出非阻塞请求，
+与 cached_get() 共用同一个磁盘缓存，返回同样的 requests.Response 对象。
+没有安装 aiohttp 时 HAS_AIOHTTP 为False。
+"""
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from urllib.parse import urldefrag
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from synology_files import write_atomic
+
+try:
+    import aiohttp
+    HAS_AIOHTTP = True
+except ImportError:
+    HAS_AIOHTTP = False
+
+# 默认请求头
+DEFAULT_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+USER_AGENT = os.environ.get('SYNOLOGY_USER_AGENT', DEFAULT_USER_AGENT)
+
+# 超时设置（秒）
+CONNECT_TIMEOUT = 5   # 建立连接的超时
+READ_TIMEOUT = 20     # 等待服务器响应的超时
+
+# 连接池大小（应不小于批量查询的并发线程数）
+POOL_SIZE = 16
+
+# 连接失败时的重试次数和退避时间（秒，每次翻倍）
+CONNECT_RETRIES = 2
+RETRY_BACKOFF = 0.3
+
+# 只有安装了brotli解码库时才声明支持br压缩
+try:
+    import brotli  # noqa: F401
+    ACCEPT_ENCODING = 'gzip, deflate, br'
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        ACCEPT_ENCODING = 'gzip, deflate, br'
+    except ImportError:
+        ACCEPT_ENCODING = 'gzip, deflate'
+
+# 磁盘缓存设置
+HTTP_CACHE_DIR = os.environ.get('SYNOLOGY_HTTP_CACHE', '.http_cache')  # 缓存目录
+HTTP_CACHE_MAX_BYTES = 500 * 1024 * 1024  # 缓存总大小上限，超出时淘汰最久未使用的条目
+HTTP_CACHE_MAX_AGE = None  # 秒；设置后在此时间内的缓存直接使用，不再向服务器确认
+
+_session = None
+_session_lock = threading.Lock()
+
+_cache_lock = threading.Lock()
+_cache_size = None  # 当前缓存总大小（首次写入时统计）
+
+def _create_session():
+    """创建带连接池和重试策略的会话"""
+    session = requests.Session()
+    session.headers.update({
+        'User-Agent': USER_AGENT,
+        'Accept-Encoding': ACCEPT_ENCODING,
+        'Connection': 'keep-alive',
+    })
+
+    # 只对连接失败进行少量重试，HTTP状态码由调用方处理
+    retry = Retry(total=CONNECT_RETRIES, connect=CONNECT_RETRIES, read=0, status=0,
+                  backoff_factor=RETRY_BACKOFF)
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE, max_retries=retry)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+def get_session():
+    """获取共享的HTTP会话（首次调用时创建）"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _create_session()
+    return _session
+
+def set_user_agent(user_agent):
+    """修改共享会话的默认User-Agent"""
+    global USER_AGENT
+    USER_AGENT = user_agent
+    get_session().headers['User-Agent'] = user_agent
+
+def close_session():
+    """关闭共享会话并释放连接池"""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+def http_get(url, timeout=None, **kwargs):
+    """通过共享会话发送GET请求
+
+    Args:
+        url: 请求地址
+        timeout: (连接超时, 读取超时)，默认使用模块配置
+        **kwargs: 传递给 requests.Session.get 的其他参数
+    """
+    if timeout is None:
+        timeout = (CONNECT_TIMEOUT, READ_TIMEOUT)
+    return get_session().get(url, timeout=timeout, **kwargs)
+
+def _cache_paths(url):
+    """返回URL对应的缓存文件路径 (内容文件, 元数据文件)"""
+    # 页面锚点（如#specs）不会发送给服务器，不参与缓存键
+    key = hashlib.sha256(urldefrag(url)[0].encode('utf-8')).hexdigest()
+    base = os.path.join(HTTP_CACHE_DIR, key)
+    return base + '.body', base + '.json'
+
+def _load_cache_entry(url):
+    """读取缓存条目，返回 (元数据, 内容)，不存在或损坏时返回 (None, None)"""
+    body_path, meta_path = _cache_paths(url)
+    try:
+        with open(meta_path, encoding='utf-8') as f:
+            meta = json.load(f)
+        with open(body_path, 'rb') as f:
+            body = f.read()
+    except (OSError, ValueError):
+        return None, None
+    return meta, body
+
+def _store_cache_entry(url, response):
+    """保存200响应及其校验信息"""
+    global _cache_size
+    os.makedirs(HTTP_CACHE_DIR, exist_ok=True)
+    body_path, meta_path = _cache_paths(url)
+    meta = {
+        'url': url,
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+        'headers': {k: v for k, v in response.headers.items()
+                    if k.lower() in ('content-type', 'etag', 'last-modified')},
+        'encoding': response.encoding,
+        'stored_at': time.time(),
+    }
+    body = response.content
+    try:
+        old_size = os.path.getsize(body_path)
+    except OSError:
+        old_size = 0
+    write_atomic(body_path, body)
+    write_atomic(meta_path, json.dumps(meta, ensure_ascii=False).encode('utf-8'))
+
+    with _cache_lock:
+        if _cache_size is None:
+            _cache_size = _scan_cache_size()
+        else:
+            _cache_size += len(body) - old_size
+        if _cache_size > HTTP_CACHE_MAX_BYTES:
+            _evict_cache()
+
+def _touch_cache_entry(url, meta):
+    """304时刷新缓存条目的确认时间和访问时间（用于淘汰排序）"""
+    body_path, meta_path = _cache_paths(url)
+    meta['stored_at'] = time.time()
+    try:
+        write_atomic(meta_path, json.dumps(meta, ensure_ascii=False).encode('utf-8'))
+        os.utime(body_path)
+    except OSError:
+        pass
+
+def _scan_cache_size():
+    """统计缓存目录中内容文件的总大小"""
+    total = 0
+    with os.scandir(HTTP_CACHE_DIR) as entries:
+        for entry in entries:
+            if entry.name.endswith('.body'):
+                total += entry.stat().st_size
+    return total
+
+def _evict_cache():
+    """按访问时间淘汰缓存，直到总大小降到上限的90%以下（调用方持有_cache_lock）"""
+    global _cache_size
+    bodies = []
+    with os.scandir(HTTP_CACHE_DIR) as entries:
+        for entry in entries:
+            if entry.name.endswith('.body'):
+                stat = entry.stat()
+                bodies.append((stat.st_mtime, stat.st_size, entry.path))
+    bodies.sort()
+
+    total = sum(size for _, size, _ in bodies)
+    target = HTTP_CACHE_MAX_BYTES * 0.9
+    for _, size, path in bodies:
+        if total <= target:
+            break
+        for p in (path, path[:-len('.body')] + '.json'):
+            try:
+                os.remove(p)
+            except OSError:
+                pass
+        total -= size
+    _cache_size = total
+
+def _response_from_cache(url, meta, body):
+    """用缓存内容构造一个200响应"""
+    response = requests.Response()
+    response.status_code = 200
+    response._content = body
+    response.headers = CaseInsensitiveDict(meta.get('headers', {}))
+    response.encoding = meta.get('encoding')
+    response.url = url
+    response.from_cache = True
+    return response
+
+def clear_http_cache():
+    """清空磁盘HTTP缓存"""
+    global _cache_size
+    with _cache_lock:
+        if os.path.isdir(HTTP_CACHE_DIR):
+            for name in os.listdir(HTTP_CACHE_DIR):
+                try:
+                    os.remove(os.path.join(HTTP_CACHE_DIR, name))
+                except OSError:
+                    pass
+        _cache_size = 0
+
+def _prepare_cached_request(url, max_age, headers):
+    """读取缓存并生成条件请求头
+
+    返回 (缓存响应, 元数据, 内容, 请求头)；缓存仍在有效期内时缓存响应不为None，不需要发送请求。
+    """
+    if max_age is None:
+        max_age = HTTP_CACHE_MAX_AGE
+
+    meta, body = _load_cache_entry(url)
+    if meta is not None and max_age is not None and time.time() - meta.get('stored_at', 0) < max_age:
+        return _response_from_cache(url, meta, body), meta, body, None
+
+    headers = dict(headers or {})
+    if meta is not None:
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+    return None, meta, body, headers
+
+def _finish_cached_request(url, meta, body, response):
+    """处理条件请求的响应：304时返回缓存内容，200时写入缓存"""
+    if response.status_code == 304 and meta is not None:
+        _touch_cache_entry(url, meta)
+        return _response_from_cache(url, meta, body)
+
+    response.from_cache = False
+    if response.status_code == 200:
+        try:
+            _store_cache_entry(url, response)
+        except OSError as e:
+            print(f"写入HTTP缓存失败: {str(e)}")
+    return response
+
+def cached_get(url, max_age=None, timeout=None, **kwargs):
+    """带磁盘缓存的GET请求
+
+    - 缓存中有该URL时发送条件请求（If-None-Match / If-Modified-Since），
+      服务器返回304则直接使用缓存内容
+    - max_age（秒，默认取 HTTP_CACHE_MAX_AGE）内的缓存不再向服务器确认
+    - 只缓存200响应；返回的响应对象 from_cache 属性表示内容是否来自缓存
+    """
+    cached, meta, body, headers = _prepare_cached_request(url, max_age, kwargs.pop('headers', None))
+    if cached is not None:
+        return cached
+    response = http_get(url, timeout=timeout, headers=headers, **kwargs)
+    return _finish_cached_request(url, meta, body, response)
+
+def create_async_session(limit=POOL_SIZE):
+    """创建 aiohttp 会话（需要在事件循环中调用，用完后关闭）
+
+    limit 为同时打开的连接数上限；请求头和超时与共享的 requests 会话相同。
+    """
+    connector = aiohttp.TCPConnector(limit=limit, limit_per_host=limit)
+    timeout = aiohttp.ClientTimeout(total=None, sock_connect=CONNECT_TIMEOUT, sock_read=READ_TIMEOUT)
+    headers = {'User-Agent': USER_AGENT, 'Accept-Encoding': ACCEPT_ENCODING}
+    return aiohttp.ClientSession(connector=connector, timeout=timeout, headers=headers)
+
+async def _async_get(session, url, headers):
+    """用 aiohttp 发送GET请求，把响应转换为 requests.Response
+
+    连接失败时按 CONNECT_RETRIES 重试；请求错误转换为 requests 的异常，调用方按同样的方式处理。
+    """
+    for attempt in range(CONNECT_RETRIES + 1):
+        try:
+            async with session.get(url, headers=headers) as resp:
+                body = await resp.read()
+                response = requests.Response()
+                response.status_code = resp.status
+                response.reason = resp.reason
+                response._content = body
+                response.headers = CaseInsensitiveDict(resp.headers)
+                response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+                response.url = str(resp.url)
+                return response
+        except aiohttp.ClientConnectorError as e:
+            if attempt == CONNECT_RETRIES:
+                raise requests.exceptions.ConnectionError(str(e)) from e
+            await asyncio.sleep(RETRY_BACKOFF * 2 ** attempt)
+        except asyncio.TimeoutError as e:
+            raise requests.exceptions.Timeout(f"请求超时: {url}") from e
+        except aiohttp.ClientError as e:
+            raise requests.exceptions.ConnectionError(str(e)) from e
+
+async def cached_get_async(session, url, max_age=None, headers=None):
+    """cached_get() 的异步版本：通过 aiohttp 会话发送请求，等待响应时不占用线程
+
+    缓存文件很小，读写仍在事件循环中同步完成。
+    """
+    cached, meta, body, headers = _prepare_cached_request(url, max_age, headers)
+    if cached is not None:
+        return cached
+    response = await _async_get(session, url, headers)
+    return _finish_cached_request(url, meta, body, response)
@@ -4,7 +4,17 @@ import pandas as pd
 from openpyxl import load_workbook, Workbook
 from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
 from datetime import datetime
+import logging
 import os
+import queue
+import re
+import threading
+
+from synology_catalogue import (build_catalogue, load_snapshot, save_snapshot, read_product_entry,
+                                iter_product_entries, get_product_buckets, prime_product_buckets,
+                                SERIES_PREFIXES, SPEC_CONFIG_SHEET)
+from synology_xlsx import file_signature
+from synology_text_metrics import wrapped_line_count
 
 # 版本信息
 __version__ = "1.2"
@@ -15,6 +25,11 @@ SPECS_FILE = "群晖产品资料汇总.xlsx"  # 产品规格文件
 QUOTE_DIR = "客户报价单文件夹"  # 报价单输出目录
 CUSTOMER_INFO_DIR = "客户信息文件夹"  # 客户信息记录目录
 CUSTOMER_INFO_FILE = os.path.join(CUSTOMER_INFO_DIR, "客户信息表.xlsx")  # 客户信息记录文件
+SPECS_COLUMN_WIDTH = 40  # 报价单规格描述列宽
+BACKGROUND_POLL_INTERVAL = 200  # 检查后台任务（目录更新、规格预取）结果的间隔（毫秒）
+
+# 逐个产品的信息只在调试级别输出
+logger = logging.getLogger(__name__)
 
 # 产品类型定义
 PRODUCT_CATEGORIES = {
@@ -70,6 +85,16 @@ class QuoteGenerator:
         # 初始化产品数据
         self.available_products = []
         self.product_categories = {}
+        self.spec_index = None  # 型号 -> {规格项: 规格值}，后台读取完成前为None
+        self.spec_config = None  # 产品系列前缀 -> 报价单中列出的参数
+        self._catalogue_signature = None  # 目录对应的规格文件 (修改时间, 大小)
+        self._spec_descriptions = {}  # 型号 -> 报价单中的规格描述（选择产品系列时在后台预取）
+        self._spec_descriptions_signature = None
+        self._prefetch_generation = 0
+        self._prefetch_running = 0
+        self._prefetch_results = queue.Queue()
+        self._catalogue_thread = None
+        self._catalogue_results = queue.Queue()
         
         # 加载现有客户数据
         self.existing_customers = self.load_existing_customers()
@@ -103,155 +128,109 @@ class QuoteGenerator:
         return customers
     
     def load_product_data(self):
-        """加载产品数据"""
+        """加载产品数据
+
+        规格文件没有变化时直接使用目录快照；文件已变化时先使用旧快照，在后台重新生成。
+        没有快照时先读取工作表名和分类查询表格，各产品的规格在后台读取。
+        """
         try:
             if not os.path.exists(SPECS_FILE):
                 messagebox.showerror("错误", f"未找到产品规格文件：{SPECS_FILE}")
                 return
             
-            print("\n开始加载产品数据...")
-            
-            # 读取Excel文件中的所有工作表名（产品型号）
-            wb = load_workbook(SPECS_FILE, read_only=True)
-            self.available_products = [sheet for sheet in wb.sheetnames 
-                                    if sheet not in ["产品汇总表", "查询表格", "硬盘分类查询表格", "配件分类查询表格"]]
-            print(f"找到 {len(self.available_products)} 个产品规格表")
-            
-            # 初始化产品分类字典，包含主要产品类型
-            self.product_categories = {
-                "NAS设备": {
-                    "DS系列": [],
-                    "RS系列": [],
-                    "FS系列": [],
-                    "SA系列": [],
-                    "UC系列": [],
-                },
-                "存储扩充设备": {
-                    "RX系列": [],
-                    "DX系列": [],
-                    "FX系列": [],
-                    "RXD系列": [],
-                },
-                "PCIe扩充卡": {
-                    "网卡": [],
-                    "M.2转接卡": [],
-                }
-            }
-            
-            # 根据产品型号前缀分类主要产品
-            print("\n正在根据产品型号前缀分类主要产品...")
-            for product in self.available_products:
-                # NAS设备分类
-                if product.startswith('DS'):
-                    self.product_categories["NAS设备"]["DS系列"].append(product)
-                    print(f"  添加到DS系列: {product}")
-                elif product.startswith('RS'):
-                    self.product_categories["NAS设备"]["RS系列"].append(product)
-                    print(f"  添加到RS系列: {product}")
-                elif product.startswith('FS'):
-                    self.product_categories["NAS设备"]["FS系列"].append(product)
-                    print(f"  添加到FS系列: {product}")
-                elif product.startswith('SA'):
-                    self.product_categories["NAS设备"]["SA系列"].append(product)
-                    print(f"  添加到SA系列: {product}")
-                elif product.startswith('UC'):
-                    self.product_categories["NAS设备"]["UC系列"].append(product)
-                    print(f"  添加到UC系列: {product}")
-                # 存储扩充设备分类
-                elif product.startswith('RX') and not product.startswith('RXD'):
-                    self.product_categories["存储扩充设备"]["RX系列"].append(product)
-                    print(f"  添加到RX系列: {product}")
-                elif product.startswith('DX'):
-                    self.product_categories["存储扩充设备"]["DX系列"].append(product)
-                    print(f"  添加到DX系列: {product}")
-                elif product.startswith('FX'):
-                    self.product_categories["存储扩充设备"]["FX系列"].append(product)
-                    print(f"  添加到FX系列: {product}")
-                elif product.startswith('RXD'):
-                    self.product_categories["存储扩充设备"]["RXD系列"].append(product)
-                    print(f"  添加到RXD系列: {product}")
-                # PCIe扩充卡分类
-                elif product.startswith('E10G'):
-                    self.product_categories["PCIe扩充卡"]["网卡"].append(product)
-                    print(f"  添加到网卡: {product}")
-                elif product.startswith('M2D'):
-                    self.product_categories["PCIe扩充卡"]["M.2转接卡"].append(product)
-                    print(f"  添加到M.2转接卡: {product}")
-            
-            # 从硬盘分类查询表格读取存储设备分类
-            print("\n正在从硬盘分类查询表格读取存储设备分类...")
-            try:
-                df_storage = pd.read_excel(SPECS_FILE, sheet_name="硬盘分类查询表格")
-                if not df_storage.empty:
-                    # 从列名中获取产品系列（排除'产品类型'和'产品系列'列）
-                    storage_series = [col for col in df_storage.columns if col not in ['产品类型', '产品系列']]
-                    if storage_series:
-                        self.product_categories["存储设备"] = {series: [] for series in storage_series}
-                        print(f"添加存储设备系列: {storage_series}")
-                        
-                        # 获取每列中非空的单元格内容作为产品型号
-                        for series in storage_series:
-                            if series in df_storage.columns:
-                                # 获取该列所有非空值
-                                models = df_storage[series].dropna().astype(str).tolist()
-                                # 过滤掉空字符串和只包含空格的字符串
-                                models = [model.strip() for model in models if model.strip()]
-                                if models:
-                                    self.product_categories["存储设备"][series] = models
-                                    print(f"  添加存储设备型号到{series}: {models}")
-            except Exception as e:
-                print(f"读取硬盘分类查询表格时出错：{str(e)}")
-            
-            # 从配件分类查询表格读取配件类分类
-            print("\n正在从配件分类查询表格读取配件类分类...")
-            try:
-                df_accessories = pd.read_excel(SPECS_FILE, sheet_name="配件分类查询表格")
-                if not df_accessories.empty:
-                    # 从列名中获取产品系列（排除'产品类型'和'产品系列'列）
-                    accessory_series = [col for col in df_accessories.columns if col not in ['产品类型', '产品系列']]
-                    if accessory_series:
-                        self.product_categories["配件类"] = {series: [] for series in accessory_series}
-                        print(f"添加配件类系列: {accessory_series}")
-                        
-                        # 获取每列中非空的单元格内容作为产品型号
-                        for series in accessory_series:
-                            if series in df_accessories.columns:
-                                # 获取该列所有非空值
-                                models = df_accessories[series].dropna().astype(str).tolist()
-                                # 过滤掉空字符串和只包含空格的字符串
-                                models = [model.strip() for model in models if model.strip()]
-                                if models:
-                                    self.product_categories["配件类"][series] = models
-                                    print(f"  添加配件型号到{series}: {models}")
-            except Exception as e:
-                print(f"读取配件分类查询表格时出错：{str(e)}")
-            
-            # 对每个子类别中的产品型号进行排序
-            for category in self.product_categories:
-                for subcategory in self.product_categories[category]:
-                    self.product_categories[category][subcategory].sort()
-            
-            # 更新全局变量
-            global PRODUCT_CATEGORIES
-            PRODUCT_CATEGORIES.clear()
-            PRODUCT_CATEGORIES.update(self.product_categories)
-            
-            # 打印最终的产品分类统计
-            self._print_category_statistics()
-            
-            # 确保下拉菜单数据正确更新
-            if hasattr(self, 'category_combo'):
-                categories = list(self.product_categories.keys())
-                print(f"\n可选的产品类型: {categories}")
-                self.category_combo['values'] = categories
+            catalogue, valid = load_snapshot(SPECS_FILE)
+            if catalogue is None:
+                print("\n开始加载产品数据...")
+                catalogue = build_catalogue(SPECS_FILE, with_specs=False)
+                self._rebuild_catalogue_in_background()
+            elif valid:
+                print("\n已从目录快照加载产品数据")
+            else:
+                print("\n规格文件已变化，正在后台更新产品目录...")
+                self._rebuild_catalogue_in_background()
             
-            wb.close()
+            self._apply_catalogue(catalogue)
             
         except Exception as e:
             messagebox.showerror("错误", f"加载产品数据时出错：{str(e)}")
             self.available_products = []
             self.product_categories = {}
     
+    def _apply_catalogue(self, catalogue):
+        """使用产品目录更新产品列表和分类"""
+        self.available_products = list(catalogue['products'])
+        print(f"找到 {len(self.available_products)} 个产品规格表")
+        self.product_categories = {category: {series: list(models) for series, models in subcategories.items()}
+                                   for category, subcategories in catalogue['categories'].items()}
+        self.spec_index = catalogue['specs']
+        self.spec_config = catalogue['config']
+        source = catalogue['source']
+        self._catalogue_signature = (source['mtime_ns'], source['size'])
+        prime_product_buckets(catalogue)
+        
+        # 更新全局变量
+        global PRODUCT_CATEGORIES
+        PRODUCT_CATEGORIES.clear()
+        PRODUCT_CATEGORIES.update(self.product_categories)
+        
+        # 打印最终的产品分类统计
+        self._print_category_statistics()
+        
+        # 确保下拉菜单数据正确更新
+        if hasattr(self, 'category_combo'):
+            categories = list(self.product_categories.keys())
+            print(f"\n可选的产品类型: {categories}")
+            self.category_combo['values'] = categories
+    
+    def _catalogue_is_current(self):
+        """目录是否与规格文件一致（只比较修改时间和大小）"""
+        try:
+            return file_signature(SPECS_FILE) == self._catalogue_signature
+        except OSError:
+            return False
+    
+    def _get_product_entry(self, product):
+        """返回 (规格配置, 产品规格)
+
+        目录是最新的时直接查询；规格文件已变化或规格索引还未生成时，
+        只读取这一个产品，同时在后台重新生成目录。
+        """
+        if self._catalogue_is_current() and self.spec_index is not None:
+            return self.spec_config, self.spec_index.get(product)
+        if not self._catalogue_is_current():
+            self._rebuild_catalogue_in_background()
+        return read_product_entry(SPECS_FILE, product)
+    
+    def _rebuild_catalogue_in_background(self):
+        """在后台线程中重新生成产品目录并保存快照，完成后在界面线程中应用"""
+        if self._catalogue_thread is not None and self._catalogue_thread.is_alive():
+            return
+        
+        def worker():
+            try:
+                catalogue = build_catalogue(SPECS_FILE)
+                save_snapshot(catalogue)
+                self._catalogue_results.put(catalogue)
+            except Exception as e:
+                self._catalogue_results.put(e)
+        
+        self._catalogue_thread = threading.Thread(target=worker, daemon=True)
+        self._catalogue_thread.start()
+        self.root.after(BACKGROUND_POLL_INTERVAL, self._poll_catalogue_rebuild)
+    
+    def _poll_catalogue_rebuild(self):
+        """检查后台生成的产品目录（Tk不是线程安全的，界面只在主线程中更新）"""
+        try:
+            result = self._catalogue_results.get_nowait()
+        except queue.Empty:
+            self.root.after(BACKGROUND_POLL_INTERVAL, self._poll_catalogue_rebuild)
+            return
+        if isinstance(result, Exception):
+            print(f"更新产品目录时出错：{str(result)}")
+            return
+        self._apply_catalogue(result)
+        print("产品目录已更新")
+    
     def _process_category_data(self, df, fixed_category=None):
         """处理分类数据
         Args:
@@ -341,7 +320,7 @@ class QuoteGenerator:
             for subcategory, products in self.product_categories[category].items():
                 print(f"  {subcategory}: {len(products)} 个产品")
                 if products:  # 打印实际的产品型号
-                    print(f"    产品型号: {', '.join(products)}")
+                    logger.debug(f"    产品型号: {', '.join(products)}")
         
         print(f"\n总计: {total_products} 个产品")
     
@@ -578,8 +557,21 @@ class QuoteGenerator:
             self.contact_phone.delete(0, tk.END)
             self.contact_phone.insert(0, customer_info['phone'])
     
+    def _refresh_product_lists(self):
+        """规格文件变化时更新按型号前缀分类的产品列表，并在后台重新生成完整目录"""
+        if self._catalogue_is_current():
+            return
+        products, buckets = get_product_buckets(SPECS_FILE)
+        self.available_products = list(products)
+        for _, category, series in SERIES_PREFIXES:
+            if category in self.product_categories:
+                self.product_categories[category][series] = list(buckets[series])
+        self._rebuild_catalogue_in_background()
+    
     def on_category_selected(self, event):
         """产品类型选择事件处理"""
+        if os.path.exists(SPECS_FILE):
+            self._refresh_product_lists()
         category = self.category_var.get()
         if category and category in self.product_categories:
             # 更新子类型下拉框
@@ -593,7 +585,7 @@ class QuoteGenerator:
             self.product_combo['values'] = []
     
     def on_subcategory_selected(self, event):
-        """产品子类型选择事件处理 - 按需加载产品数据"""
+        """产品子类型选择事件处理"""
         category = self.category_var.get()
         subcategory = self.subcategory_var.get()
         if not (category and subcategory and 
@@ -604,49 +596,21 @@ class QuoteGenerator:
             return
             
         try:
-            # 按需加载该子类别的产品数据
             if not os.path.exists(SPECS_FILE):
                 messagebox.showerror("错误", f"未找到产品规格文件：{SPECS_FILE}")
                 return
-                
-            # 根据产品系列前缀筛选产品
-            prefix_map = {
-                "DS系列": "DS",
-                "RS系列": "RS", 
-                "FS系列": "FS",
-                "SA系列": "SA",
-                "UC系列": "UC",
-                "RX系列": "RX",
-                "DX系列": "DX",
-                "FX系列": "FX",
-                "RXD系列": "RXD",
-                "网卡": "E10G",
-                "M.2转接卡": "M2D"
-            }
             
-            prefix = prefix_map.get(subcategory, "")
-            if not prefix:
-                self.product_combo['values'] = []
-                return
-                
-            # 只读取工作表名而不加载整个文件
-            wb = load_workbook(SPECS_FILE, read_only=True)
-            products = [sheet for sheet in wb.sheetnames 
-                       if sheet.startswith(prefix) and 
-                       sheet not in ["产品汇总表", "查询表格", "硬盘分类查询表格", "配件分类查询表格"]]
-            wb.close()
+            # 产品列表已预先分类排序，规格文件变化时才由共用的目录缓存重新读取工作表目录
+            self._refresh_product_lists()
+            products = self.product_categories[category][subcategory]
             
             # 更新产品下拉框
-            if products:
-                self.product_combo['values'] = sorted(products)
-                self.product_combo.set('')
-            else:
-                self.product_combo['values'] = []
-                self.product_combo.set('')
+            self.product_combo['values'] = products
+            self.product_combo.set('')
+            # 在后台预取这些产品的规格描述（同时停止之前产品系列的预取）
+            self._prefetch_spec_descriptions(products)
+            if not products:
                 messagebox.showwarning("提示", f"未找到{category}-{subcategory}的产品数据")
-                
-            # 缓存已加载的产品列表
-            self.product_categories[category][subcategory] = products
             
         except Exception as e:
             messagebox.showerror("错误", f"加载产品数据时出错：{str(e)}")
@@ -666,77 +630,126 @@ class QuoteGenerator:
                     f"请确保文件位于：{os.path.abspath(SPECS_FILE)}")
                 return
             
-            # 读取产品规格
-            wb = load_workbook(SPECS_FILE, read_only=True)
-            
-            # 1. 获取产品系列前缀(如"DS"、"RS"等)
-            import re
-            series_prefix = re.match(r'^([A-Z]+)', selected_product).group(1)
-            
-            # 2. 从"规格配置"工作表获取需要提取的参数
-            if "规格配置" not in wb.sheetnames:
-                messagebox.showerror("错误", 
-                    "未找到'规格配置'工作表\n"
-                    "请在Excel文件中创建'规格配置'工作表，格式为：\n"
-                    "A列: 产品系列前缀(如DS/RS/FS等)\n"
-                    "B列: 需要提取的参数(逗号分隔)")
-                self.current_specs = ""
-                return
-                
-            config_sheet = wb["规格配置"]
-            params_to_extract = []
+            # 优先使用预取的规格描述
+            descriptions = self._current_spec_descriptions()
+            description = descriptions.get(selected_product)
+            if description is None:
+                # 读取规格配置和产品规格（由目录索引查询）
+                config, product_specs = self._get_product_entry(selected_product)
+                description, error = self._describe_product(selected_product, config, product_specs)
+                if error:
+                    messagebox.showerror("错误", error)
+                    self.current_specs = ""
+                    return
+                descriptions[selected_product] = description
             
-            # 查找匹配产品系列的配置行
-            for row in config_sheet.iter_rows(min_row=1, values_only=True):
-                if row and row[0] and str(row[0]).strip() == series_prefix:
-                    if row[1]:  # 确保B列有参数配置
-                        params_to_extract = [p.strip() for p in str(row[1]).split(',') if p.strip()]
-                        break
-                    
-            if not params_to_extract:
-                messagebox.showerror("错误", 
-                    f"未找到产品系列'{series_prefix}'的配置\n"
-                    f"请在'规格配置'工作表中添加一行：\n"
-                    f"A列: {series_prefix}\n"
-                    f"B列: 需要提取的参数(逗号分隔)")
-                self.current_specs = ""
-                return
-                
-            # 3. 检查产品工作表是否存在
-            if selected_product not in wb.sheetnames:
-                available_sheets = "\n".join(wb.sheetnames)
-                messagebox.showerror("错误", 
-                    f"未找到产品'{selected_product}'的规格表\n"
-                    f"可用工作表有:\n{available_sheets}")
-                return
-            
-            # 4. 从产品工作表中提取指定的参数
-            product_sheet = wb[selected_product]
-            specs = []
-            
-            # 扫描工作表查找参数
-            for param in params_to_extract:
-                found = False
-                for row in product_sheet.iter_rows(min_row=1, max_row=100, values_only=True):
-                    if row and len(row) > 1 and row[1] and str(row[1]).strip() == param:
-                        if len(row) > 2 and row[2]:  # 参数值在第3列
-                            specs.append(f"{param}: {str(row[2]).strip()}")
-                            found = True
-                            break
-                if not found:
-                    specs.append(f"{param}: 未找到")
-                    
-            # 格式化规格描述 - 使用换行符分隔参数
-            self.current_specs = "\n".join(specs) if specs else "未找到规格信息"
+            self.current_specs = description
             
         except Exception as e:
             messagebox.showerror("错误", 
                 f"读取规格配置时出错：{str(e)}\n"
                 f"文件路径: {os.path.abspath(SPECS_FILE)}")
             self.current_specs = ""
-        finally:
-            if 'wb' in locals():
-                wb.close()
+    
+    def _describe_product(self, product, config, product_specs):
+        """按规格配置生成产品的规格描述，返回 (规格描述, 错误信息)"""
+        # 1. 获取产品系列前缀(如"DS"、"RS"等)
+        series_prefix = re.match(r'^([A-Z]+)', product).group(1)
+        
+        # 2. 从"规格配置"工作表获取需要提取的参数
+        if config is None:
+            return None, (f"未找到'{SPEC_CONFIG_SHEET}'工作表\n"
+                          f"请在Excel文件中创建'{SPEC_CONFIG_SHEET}'工作表，格式为：\n"
+                          "A列: 产品系列前缀(如DS/RS/FS等)\n"
+                          "B列: 需要提取的参数(逗号分隔)")
+        
+        params_to_extract = config.get(series_prefix)
+        if not params_to_extract:
+            return None, (f"未找到产品系列'{series_prefix}'的配置\n"
+                          f"请在'{SPEC_CONFIG_SHEET}'工作表中添加一行：\n"
+                          f"A列: {series_prefix}\n"
+                          f"B列: 需要提取的参数(逗号分隔)")
+        
+        # 3. 检查产品工作表是否存在
+        if product_specs is None:
+            available_sheets = "\n".join(self.available_products)
+            return None, (f"未找到产品'{product}'的规格表\n"
+                          f"可用工作表有:\n{available_sheets}")
+        
+        # 4. 提取指定的参数
+        specs = [f"{param}: {product_specs.get(param, '未找到')}" for param in params_to_extract]
+        
+        # 格式化规格描述 - 使用换行符分隔参数
+        return ("\n".join(specs) if specs else "未找到规格信息"), None
+    
+    def _current_spec_descriptions(self):
+        """返回与规格文件一致的规格描述缓存（文件变化后清空）"""
+        try:
+            signature = file_signature(SPECS_FILE)
+        except OSError:
+            signature = None
+        if signature != self._spec_descriptions_signature:
+            self._spec_descriptions = {}
+            self._spec_descriptions_signature = signature
+        return self._spec_descriptions
+    
+    def _prefetch_spec_descriptions(self, products):
+        """在后台线程中生成产品系列中各产品的规格描述，选择产品时直接使用
+
+        目录索引可用时只是查询字典；索引还未生成或已过期时用 iter_product_entries 读取，
+        规格文件只打开一次，规格配置和共享字符串只读取一次。
+        选择了其他产品系列后，之前的预取任务停止。
+        """
+        descriptions = self._current_spec_descriptions()
+        self._prefetch_generation += 1
+        pending = [product for product in products if product not in descriptions]
+        if not pending:
+            return
+        
+        generation = self._prefetch_generation
+        signature = self._spec_descriptions_signature
+        use_index = self._catalogue_is_current() and self.spec_index is not None
+        config, spec_index = self.spec_config, self.spec_index
+        
+        def worker():
+            try:
+                if use_index:
+                    entries = ((product, config, spec_index.get(product)) for product in pending)
+                else:
+                    entries = iter_product_entries(SPECS_FILE, pending)
+                for product, product_config, product_specs in entries:
+                    if generation != self._prefetch_generation:
+                        break
+                    try:
+                        description, _ = self._describe_product(product, product_config, product_specs)
+                    except Exception as e:
+                        logger.debug(f"预取 {product} 的规格时出错：{str(e)}")
+                        continue
+                    if description is not None:
+                        self._prefetch_results.put((signature, product, description))
+            except Exception as e:
+                logger.debug(f"预取规格时读取规格文件出错：{str(e)}")
+            finally:
+                self._prefetch_results.put((signature, None, None))
+        
+        self._prefetch_running += 1
+        threading.Thread(target=worker, daemon=True).start()
+        if self._prefetch_running == 1:
+            self.root.after(BACKGROUND_POLL_INTERVAL, self._poll_prefetch)
+    
+    def _poll_prefetch(self):
+        """把后台预取的规格描述放入缓存（在界面线程中执行）"""
+        while True:
+            try:
+                signature, product, description = self._prefetch_results.get_nowait()
+            except queue.Empty:
+                break
+            if product is None:
+                self._prefetch_running -= 1
+            elif signature == self._spec_descriptions_signature:
+                self._spec_descriptions.setdefault(product, description)
+        if self._prefetch_running:
+            self.root.after(BACKGROUND_POLL_INTERVAL, self._poll_prefetch)
     
     def add_product(self):
         """添加产品到报价单"""
@@ -944,8 +957,8 @@ class QuoteGenerator:
                     if col != 3:  # 规格描述列已单独设置
                         cell.alignment = Alignment(horizontal='center', vertical='center')
                 
-                # 自动调整行高 - 根据换行符数量计算行数
-                line_count = len(str(item['specs']).split('\n'))
+                # 自动调整行高 - 按规格描述列宽估算自动换行后的行数
+                line_count = wrapped_line_count(str(item['specs']), SPECS_COLUMN_WIDTH)
                 ws.row_dimensions[row].height = 20 * line_count  # 每行20像素
                 
                 total_amount += item['total']
@@ -973,7 +986,7 @@ class QuoteGenerator:
             # 设置列宽
             ws.column_dimensions['A'].width = 8    # 序号
             ws.column_dimensions['B'].width = 15   # 产品型号
-            ws.column_dimensions['C'].width = 40   # 规格描述
+            ws.column_dimensions['C'].width = SPECS_COLUMN_WIDTH   # 规格描述
             ws.column_dimensions['D'].width = 8    # 数量
             ws.column_dimensions['E'].width = 15   # 单价
             ws.column_dimensions['F'].width = 10   # 折扣(%)
@@ -1154,5 +1167,7 @@ class QuoteGenerator:
         self.root.mainloop()
 
 if __name__ == "__main__":
+    # 设置环境变量 QUOTE_LOG_LEVEL=DEBUG 可显示逐个产品的加载信息
+    logging.basicConfig(level=os.environ.get('QUOTE_LOG_LEVEL', 'INFO'), format='%(message)s')
     app = QuoteGenerator()
     app.run()
@@ -0,0 +1,203 @@
+"""规格页面解析引擎
+
+从群晖官网产品页面中提取硬件规格表，返回 [规格项, 规格值, 技术指标] 行列表。
+
+支持两种引擎：
+- lxml：只遍历表格和标题节点，在一次正向遍历中确定每个表格的标题，
+  规格部分结束后立即停止（默认，需要安装lxml）
+- html.parser：使用BeautifulSoup逐个表格向前查找标题（原有实现，无额外依赖）
+
+两种引擎的输出相同，可通过环境变量 SYNOLOGY_SPEC_PARSER 或 engine 参数选择。
+"""
+import os
+
+from bs4 import BeautifulSoup
+
+try:
+    import lxml.html
+    from lxml import etree
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+
+# 标题所在的标签
+HEADING_TAGS = ('h2', 'h3', 'h4', 'h5', 'div')
+# 标题中包含这些关键词的表格属于规格部分
+SPEC_KEYWORDS = ['硬件', 'hardware', '规格', 'specifications']
+# 这些标签中的文字不计入get_text（与BeautifulSoup的html.parser行为一致）
+NON_TEXT_TAGS = frozenset(['script', 'style', 'template', 'rt', 'rp'])
+
+CHECK_MARK = '✓'
+
+DEFAULT_ENGINE = os.environ.get('SYNOLOGY_SPEC_PARSER', 'auto')
+
+def _iter_tables_bs4(html):
+    """html.parser引擎：依次返回 (标题文字或None, 行迭代器)"""
+    soup = BeautifulSoup(html, 'html.parser')
+
+    for table in soup.find_all('table'):
+        # 查找表格的前一个标题
+        prev_elem = table.find_previous(list(HEADING_TAGS))
+        title_text = prev_elem.get_text(strip=True) if prev_elem else None
+        yield title_text, _iter_rows_bs4(table)
+
+def _iter_rows_bs4(table):
+    """返回表格每行的 (规格项, 规格值, 技术指标)"""
+    for row in table.find_all('tr'):
+        cells = row.find_all(['th', 'td'])
+        if not cells:
+            continue
+
+        # 获取规格项（第一列）
+        spec_name = cells[0].get_text(strip=True)
+
+        # 获取规格值（第二列，如果存在）
+        spec_value = ""
+        if len(cells) > 1:
+            # 检查是否有特殊标记（如勾号）
+            if cells[1].find('img', alt=CHECK_MARK):
+                spec_value = CHECK_MARK
+            else:
+                spec_value = cells[1].get_text(strip=True)
+
+        # 获取备注（第三列，如果存在）
+        spec_note = ""
+        if len(cells) > 2:
+            spec_note = cells[2].get_text(strip=True)
+
+        yield spec_name, spec_value, spec_note
+
+def _lxml_text(element):
+    """与BeautifulSoup的 get_text(strip=True) 相同：拼接去除空白后的文字片段"""
+    parts = []
+
+    def walk(node):
+        if node.tag not in NON_TEXT_TAGS:
+            if node.text:
+                parts.append(node.text.strip())
+            for child in node:
+                if isinstance(child.tag, str):
+                    walk(child)
+                # 注释本身的文字不计入，但其后的文字属于当前节点
+                if child.tail:
+                    parts.append(child.tail.strip())
+
+    walk(element)
+    return ''.join(parts)
+
+def _iter_tables_lxml(html):
+    """lxml引擎：一次正向遍历，依次返回 (标题文字或None, 行迭代器)"""
+    try:
+        try:
+            root = lxml.html.document_fromstring(html)
+        except ValueError:
+            # 带编码声明的字符串需要先转为字节
+            root = lxml.html.document_fromstring(html.encode('utf-8'))
+    except etree.ParserError:
+        # 空页面
+        return
+
+    # 按文档顺序遍历时，表格之前最后出现的标题节点就是 find_previous 的结果
+    heading = None
+    heading_texts = {}
+    for element in root.iter('table', *HEADING_TAGS):
+        if element.tag != 'table':
+            heading = element
+            continue
+
+        if heading is None:
+            title_text = None
+        else:
+            # 多个表格共用同一标题时只计算一次文字
+            title_text = heading_texts.get(heading)
+            if title_text is None:
+                title_text = heading_texts[heading] = _lxml_text(heading)
+        yield title_text, _iter_rows_lxml(element)
+
+def _iter_rows_lxml(table):
+    """返回表格每行的 (规格项, 规格值, 技术指标)"""
+    for row in table.iter('tr'):
+        cells = list(row.iter('th', 'td'))
+        if not cells:
+            continue
+
+        spec_name = _lxml_text(cells[0])
+
+        spec_value = ""
+        if len(cells) > 1:
+            if any(img.get('alt') == CHECK_MARK for img in cells[1].iter('img')):
+                spec_value = CHECK_MARK
+            else:
+                spec_value = _lxml_text(cells[1])
+
+        spec_note = ""
+        if len(cells) > 2:
+            spec_note = _lxml_text(cells[2])
+
+        yield spec_name, spec_value, spec_note
+
+ENGINES = {
+    'html.parser': _iter_tables_bs4,
+}
+if HAS_LXML:
+    ENGINES['lxml'] = _iter_tables_lxml
+
+def resolve_engine(engine=None):
+    """返回实际使用的引擎名称（auto时优先使用lxml）"""
+    engine = engine or DEFAULT_ENGINE
+    if engine == 'auto':
+        return 'lxml' if HAS_LXML else 'html.parser'
+    if engine not in ENGINES:
+        raise ValueError(f"不支持的解析引擎: {engine}（可选: {', '.join(ENGINES)}）")
+    return engine
+
+def extract_spec_rows(html, engine=None, with_sections=False):
+    """提取规格部分的所有行
+
+    Args:
+        html: 页面HTML
+        engine: 'lxml'、'html.parser' 或 'auto'（默认取 SYNOLOGY_SPEC_PARSER）
+        with_sections: 为True时每行前面加上所属章节的标题
+
+    Returns:
+        [[规格项, 规格值, 技术指标], ...]；同一规格项连续出现时，后续行的规格项为空
+    """
+    iter_tables = ENGINES[resolve_engine(engine)]
+
+    specs_data = []
+    hardware_section_found = False
+    last_spec_item = None  # 用于记录上一个规格项
+    section_title = ''
+
+    for title_text, rows in iter_tables(html):
+        if title_text is not None:
+            # 处理规格相关的表格
+            if any(keyword in title_text.lower() for keyword in SPEC_KEYWORDS):
+                hardware_section_found = True
+                section_title = title_text
+                last_spec_item = None  # 重置上一个规格项
+            elif hardware_section_found:
+                # 如果已经处理完规格部分，就退出循环
+                break
+            else:
+                continue
+
+        # 如果不在规格部分，跳过此表格
+        if not hardware_section_found:
+            continue
+
+        for spec_name, spec_value, spec_note in rows:
+            # 只添加非空的规格项
+            if spec_name or spec_value or spec_note:
+                # 如果规格项与上一个相同，则设为空字符串
+                if spec_name == last_spec_item:
+                    spec_name = ""
+                elif spec_name:  # 如果是新的非空规格项
+                    last_spec_item = spec_name
+
+                if with_sections:
+                    specs_data.append([section_title, spec_name, spec_value, spec_note])
+                else:
+                    specs_data.append([spec_name, spec_value, spec_note])
+
+    return specs_data
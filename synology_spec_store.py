@@ -0,0 +1,141 @@
+"""产品规格库（SQLite）
+
+抓取到的规格按行保存在SQLite数据库中，作为规格数据的主存储；
+Excel汇总文件由规格库导出生成。
+
+表结构：
+- products：每个产品一行（型号、抓取时间、来源页面、规格行数）
+- specs：每条规格一行
+    model       产品型号
+    position    在规格表中的顺序
+    category    规格大类（Excel第一列，已向下填充）
+    item        规格项（Excel第二列）
+    value       规格值（Excel第三列）
+    note        规格所属的页面章节标题
+    scraped_at  抓取时间
+    source_url  来源页面
+"""
+import os
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+
+import pandas as pd
+
+SPEC_DB_FILE = os.environ.get('SYNOLOGY_SPEC_DB', "群晖产品规格库.db")
+
+# Excel规格表的列名
+SPEC_COLUMNS = ['规格项', '规格值', '技术指标']
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    model       TEXT PRIMARY KEY,
+    scraped_at  TEXT NOT NULL,
+    source_url  TEXT,
+    row_count   INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS specs (
+    model       TEXT NOT NULL,
+    position    INTEGER NOT NULL,
+    category    TEXT NOT NULL,
+    item        TEXT NOT NULL,
+    value       TEXT NOT NULL,
+    note        TEXT NOT NULL,
+    scraped_at  TEXT NOT NULL,
+    source_url  TEXT,
+    PRIMARY KEY (model, position)
+);
+CREATE INDEX IF NOT EXISTS idx_specs_item ON specs (item);
+CREATE INDEX IF NOT EXISTS idx_specs_category ON specs (category);
+"""
+
+def connect(db_file=None):
+    """打开规格库（不存在时创建）"""
+    conn = sqlite3.connect(db_file or SPEC_DB_FILE)
+    conn.executescript(_SCHEMA)
+    return conn
+
+def _normalize_rows(df):
+    """把规格表DataFrame转换为规格库的行
+
+    规格表中同一大类的后续行第一列为空，这里向下填充大类；
+    章节标题取自 df.attrs['sections']（与行一一对应）。
+    """
+    sections = df.attrs.get('sections') or [''] * len(df)
+    rows = []
+    category = ''
+    last_section = None
+    for position, (values, section) in enumerate(zip(df[SPEC_COLUMNS].itertuples(index=False), sections)):
+        name, item, value = (str(v) if v is not None and not pd.isna(v) else '' for v in values)
+        if section != last_section:
+            # 新章节的大类不沿用上一章节
+            category = ''
+            last_section = section
+        if name:
+            category = name
+        rows.append((position, category, item, value, section or ''))
+    return rows
+
+def save_product_specs(model, df, source_url=None, scraped_at=None, db_file=None):
+    """保存（替换）一个产品的全部规格"""
+    if scraped_at is None:
+        scraped_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    if source_url is None:
+        source_url = df.attrs.get('source_url')
+
+    rows = _normalize_rows(df)
+    with closing(connect(db_file)) as conn, conn:
+        conn.execute("DELETE FROM specs WHERE model = ?", (model,))
+        conn.executemany(
+            "INSERT INTO specs (model, position, category, item, value, note, scraped_at, source_url) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(model, position, category, item, value, note, scraped_at, source_url)
+             for position, category, item, value, note in rows])
+        conn.execute(
+            "INSERT OR REPLACE INTO products (model, scraped_at, source_url, row_count) VALUES (?, ?, ?, ?)",
+            (model, scraped_at, source_url, len(rows)))
+
+def load_product_specs(model, db_file=None):
+    """读取一个产品的规格，返回与抓取结果格式相同的DataFrame，不存在时返回None"""
+    with closing(connect(db_file)) as conn:
+        product = conn.execute(
+            "SELECT scraped_at, source_url FROM products WHERE model = ?", (model,)).fetchone()
+        if product is None:
+            return None
+        rows = conn.execute(
+            "SELECT category, item, value, note FROM specs WHERE model = ? ORDER BY position",
+            (model,)).fetchall()
+
+    # 还原Excel中的写法：同一章节内连续相同的大类只在第一行显示
+    specs_data = []
+    sections = []
+    last_category = None
+    last_section = None
+    for category, item, value, note in rows:
+        if note != last_section:
+            last_category = None
+            last_section = note
+        name = '' if category == last_category else category
+        last_category = category
+        specs_data.append([name, item, value])
+        sections.append(note)
+
+    df = pd.DataFrame(specs_data, columns=SPEC_COLUMNS)
+    df.attrs['source_url'] = product[1]
+    df.attrs['sections'] = sections
+    df.attrs['scraped_at'] = product[0]
+    return df
+
+def list_products(db_file=None):
+    """列出规格库中的所有产品，返回 [(型号, 抓取时间, 来源页面), ...]"""
+    with closing(connect(db_file)) as conn:
+        return conn.execute(
+            "SELECT model, scraped_at, source_url FROM products ORDER BY model").fetchall()
+
+def get_spec_value(model, item, db_file=None):
+    """查询某个产品某个规格项的值，不存在时返回None"""
+    with closing(connect(db_file)) as conn:
+        row = conn.execute(
+            "SELECT value FROM specs WHERE model = ? AND item = ? ORDER BY position LIMIT 1",
+            (model, item)).fetchone()
+    return row[0] if row else None
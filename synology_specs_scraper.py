@@ -1,22 +1,44 @@
 import requests
-from bs4 import BeautifulSoup
 import pandas as pd
+import numpy as np
 import tkinter as tk
 from tkinter import messagebox
 import os
 import re
-from openpyxl.styles import Font, Alignment, PatternFill, Border, Side, Protection
+from openpyxl.styles import Font, Alignment, PatternFill, Border, Side, Protection, NamedStyle
+from openpyxl.styles.fonts import DEFAULT_FONT
 from openpyxl.utils import get_column_letter
 from openpyxl import load_workbook, Workbook
 from openpyxl.drawing.image import Image
 from PIL import Image as PILImage
 from io import BytesIO
 import urllib.parse
+from copy import copy
+from collections import namedtuple
 import tempfile
 from openpyxl.drawing.spreadsheet_drawing import OneCellAnchor, AnchorMarker
 from openpyxl.utils.units import pixels_to_EMU
 from datetime import datetime
 from openpyxl.worksheet.hyperlink import Hyperlink
+from openpyxl.worksheet.table import Table, TableStyleInfo
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+import argparse
+import hashlib
+import asyncio
+import json
+import multiprocessing
+import threading
+import time
+import synology_http
+from synology_http import cached_get, POOL_SIZE
+from synology_files import atomic_open, write_atomic
+from synology_spec_parser import extract_spec_rows
+from synology_text_metrics import wrapped_line_count, explicit_line_count
+import synology_spec_store
+from synology_spec_store import SPEC_COLUMNS
+from synology_xlsx import (get_sheet_names, has_sheet, read_sheet, read_sheet_tables, patch_sheet,
+                           SheetCell, SheetHyperlink)
+from openpyxl.utils.cell import coordinate_from_string, column_index_from_string
 
 # 版本信息
 __version__ = "1.4"
@@ -44,13 +66,61 @@ V1.4更新说明：
 
 EXCEL_FILE = "群晖产品资料汇总.xlsx"
 IMAGES_DIR = "产品图片"  # 图片保存目录
+ORIGINALS_DIR = os.path.join(IMAGES_DIR, "originals")  # 原图目录（按图片内容哈希保存，相同图片只保存一份）
+THUMBNAIL_DIR = os.path.join(IMAGES_DIR, ".thumbs")  # 缩略图缓存目录（按图片内容和缩略图参数缓存）
+IMAGE_INDEX_FILE = os.path.join(IMAGES_DIR, "image_index.json")  # 记录每个型号的图片内容哈希
+THUMBNAIL_WIDTH = 140  # Excel中显示的图片宽度
+THUMBNAIL_FORMATS = ('png8', 'jpeg', 'png')
+THUMBNAIL_FORMAT = 'png8'  # 嵌入工作表的缩略图格式：png8（256色调色板PNG）、jpeg 或 png（真彩色）
+THUMBNAIL_JPEG_QUALITY = 85  # JPEG缩略图的质量（1-95）
+IMAGE_PROCESSES = None  # 批量查询时图片处理进程数（None为CPU核数，0为不使用进程池）
+TRANSPARENT_TOLERANCE_DEFAULT = 15  # 背景透明化的默认容差（RGB都大于240视为白色背景）
+TRANSPARENT_TOLERANCE = None  # 嵌入工作表的图片是否把白色背景转为透明：None为不处理，否则为容差
+DEFER_IMAGES = False  # 为True时先保存规格（图片位置显示占位文字），之后由 attach_missing_images 补充图片
+IMAGE_PLACEHOLDER = '图片待补充'  # 没有图片的规格表在D1单元格显示的占位文字
+IMAGE_PLACEHOLDER_CELL = 'D1'
 SUMMARY_SHEET = "产品汇总表"  # 汇总表名称
+SUMMARY_TABLE = "ProductSummary"  # 汇总表中Excel表格的名称
+SUMMARY_HEADERS = ['序号', '产品型号', '添加时间', '备注']
+SUMMARY_NOTE = '点击表头的筛选按钮进行排序和筛选'
+DEFAULT_WORKERS = 8  # 批量查询时的默认并发线程数
+ASYNC_CONCURRENCY = 32  # 异步流水线同时进行的请求数（同时也是aiohttp的连接数上限）
+PARSE_WORKERS = 4  # 异步流水线中解析规格页面的线程数
+ROUTES_FILE = "url_routes.json"  # 记录每个型号/系列可用的页面地址和图片参数
+
+# 规格页面地址模板（{model}为产品型号），按默认尝试顺序排列
+SPEC_URL_TEMPLATES = [
+    "https://www.synology.cn/zh-cn/products/{model}#specs",
+    "https://www.synology.cn/zh-cn/products/M2_PCIe_Card/{model}#specs",
+    "https://www.synology.cn/zh-cn/products/{model}",  # 无#specs后缀
+    "https://www.synology.cn/zh-cn/products/M2_PCIe_Card/{model}",  # M2D系列路径
+    "https://www.synology.cn/zh-cn/products/network/{model}",  # 网卡路径
+    "https://www.synology.cn/zh-cn/products/PCIe_Card/{model}",  # PCIe卡通用路径
+]
+PHOTO_URL_TEMPLATE = "https://www.synology.cn/api/products/getPhoto?product={model}&type=img&sort={sort}"
+PHOTO_SORT_VALUES = ['0', '1', '2']
+
+# 失败型号记录（避免对不存在或已停产的型号重复请求）
+NEGATIVE_CACHE_FILE = "negative_cache.json"
+NEGATIVE_CACHE_TTL = 7 * 24 * 3600  # 记录有效期（秒）
+NEGATIVE_REASONS = {
+    'not_found': '官网页面不存在（所有地址均返回404）',
+    'no_specs': '页面中没有规格表',
+}
 
 # 定义样式常量
 HEADER_FILL = PatternFill(start_color="FFFFFF", end_color="FFFFFF", fill_type="solid")
 BORDER_STYLE = Side(style='thin', color="000000")
 NORMAL_BORDER = Border(left=BORDER_STYLE, right=BORDER_STYLE, top=BORDER_STYLE, bottom=BORDER_STYLE)
 
+# 规格表数据行（前三列）使用的命名样式，每个工作簿只注册一次
+SPEC_CELL_STYLES = {
+    'spec_category': (Font(bold=True), Alignment(horizontal='left', vertical='center', wrap_text=True)),  # 大类
+    'spec_subitem': (DEFAULT_FONT, Alignment(horizontal='left', vertical='center', indent=1, wrap_text=True)),  # 大类下的子项
+    'spec_value': (DEFAULT_FONT, Alignment(horizontal='left', vertical='center', wrap_text=True)),  # 规格值
+    'spec_plain': (DEFAULT_FONT, Alignment(wrap_text=True)),  # 其他单元格只自动换行
+}
+
 def validate_model_number(model):
     """验证产品型号格式
     支持的格式示例：
@@ -103,31 +173,30 @@ PCIe 扩充卡：
 - E10G18-T2
 - M2D20, FXC18"""
 
-def calculate_row_height(row):
+def calculate_row_height(row, col_widths=None):
     """计算行高
     根据单元格内容和换行数量计算合适的行高
     标准行高为15，每多一行增加15
+
+    col_widths: {列号: 列宽}，格式化整张工作表时预先取好，避免每个单元格查询列宽
     """
     max_lines = 1
     for cell in row:
         if cell.value:
             # 计算文本换行后的行数
             text = str(cell.value)
-            # 获取单元格宽度（以字符为单位）
-            col_width = cell.parent.column_dimensions[get_column_letter(cell.column)].width
             
-            # 如果启用了自动换行，计算实际行数
+            # 如果启用了自动换行，按列宽（以字符为单位）估算实际行数
             if cell.alignment and cell.alignment.wrap_text:
-                # 预估每行能容纳的字符数（考虑中文字符）
-                chars_per_line = int(col_width / 1.5)  # 假设每个中文字符宽度为1.5
-                if chars_per_line > 0:
-                    # 计算需要的行数
-                    lines = len(text) / chars_per_line
-                    max_lines = max(max_lines, int(lines) + 1)
+                if col_widths is not None:
+                    col_width = col_widths[cell.column]
+                else:
+                    col_width = cell.parent.column_dimensions[get_column_letter(cell.column)].width
+                lines = wrapped_line_count(text, col_width)
             else:
                 # 未启用自动换行时，只计算手动换行符
-                lines = text.count('\n') + 1
-                max_lines = max(max_lines, lines)
+                lines = explicit_line_count(text)
+            max_lines = max(max_lines, lines)
     
     # 基础行高15，每行增加15
     return max(20, 15 * max_lines)
@@ -137,138 +206,604 @@ def ensure_dir(directory):
     if not os.path.exists(directory):
         os.makedirs(directory)
 
-def make_background_transparent(img):
-    """将图片的白色背景转换为透明"""
+def make_background_transparent(img, tolerance=TRANSPARENT_TOLERANCE_DEFAULT):
+    """将图片的白色背景转换为透明
+
+    RGB值都大于 255 - tolerance 的像素（默认容差15，即都大于240）转换为完全透明的白色。
+    使用NumPy数组一次处理所有像素。
+    """
     # 转换图片为RGBA模式（支持透明通道）
     img = img.convert("RGBA")
-    data = img.getdata()
-    
-    # 创建新的像素数据，将接近白色的像素转换为透明
-    new_data = []
-    for item in data:
-        # 检查像素是否接近白色（RGB值都大于240）
-        if item[0] > 240 and item[1] > 240 and item[2] > 240:
-            # 将白色像素转换为完全透明
-            new_data.append((255, 255, 255, 0))
-        else:
-            new_data.append(item)
+    pixels = np.array(img)
+    
+    # 检查像素是否接近白色，将白色像素转换为完全透明
+    threshold = 255 - tolerance
+    mask = (pixels[:, :, :3] > threshold).all(axis=2)
+    pixels[mask] = (255, 255, 255, 0)
     
     # 更新图片数据
-    img.putdata(new_data)
-    return img
+    return PILImage.fromarray(pixels, "RGBA")
 
-def download_and_resize_image(model):
-    """下载并调整产品图片大小，同时保存到本地"""
-    # 确保图片目录存在
-    ensure_dir(IMAGES_DIR)
-    
-    # 构建图片URL
-    encoded_model = urllib.parse.quote(model)
-    
-    # 根据产品类型选择不同的图片URL
+def _load_json_file(path, default):
+    """读取JSON文件，不存在或损坏时返回默认值"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+def _save_json_file(path, data):
+    """先写临时文件再替换，保存JSON文件"""
+    with atomic_open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+def model_family(model):
+    """返回型号所属的系列，如 RXD1219sas -> RXD，E10G18-T1 -> E10G"""
+    match = re.match(r'^[A-Z]\d{1,2}[A-Z]', model)  # 网卡、M.2卡等PCIe设备
+    if not match:
+        match = re.match(r'^[A-Z]+', model)
+    return match.group(0) if match else model
+
+_routes = None
+_routes_lock = threading.Lock()
+
+def _get_routes():
+    """加载路由表（调用方持有_routes_lock）"""
+    global _routes
+    if _routes is None:
+        _routes = _load_json_file(ROUTES_FILE, {})
+        _routes.setdefault('models', {})
+        _routes.setdefault('families', {})
+    return _routes
+
+def lookup_route(model, key):
+    """查询已记录的路由：先查型号，再查所属系列，未记录时返回None"""
+    with _routes_lock:
+        routes = _get_routes()
+        value = routes['models'].get(model, {}).get(key)
+        if value is None:
+            value = routes['families'].get(model_family(model), {}).get(key)
+        return value
+
+def record_route(model, key, value):
+    """记录型号和所属系列的可用路由，有变化时保存路由表"""
+    with _routes_lock:
+        routes = _get_routes()
+        family = model_family(model)
+        model_routes = routes['models'].setdefault(model, {})
+        family_routes = routes['families'].setdefault(family, {})
+        if model_routes.get(key) == value and family_routes.get(key) == value:
+            return
+        model_routes[key] = value
+        family_routes[key] = value
+        try:
+            _save_json_file(ROUTES_FILE, routes)
+        except OSError as e:
+            print(f"保存路由表失败: {str(e)}")
+
+def _ordered_candidates(preferred, defaults):
+    """把已记录的路由排在最前面，其余保持默认顺序"""
+    ordered = [value for value in preferred if value is not None] + list(defaults)
+    return list(dict.fromkeys(ordered))
+
+_negative_cache = None
+_negative_cache_lock = threading.Lock()
+
+def _get_negative_cache():
+    """加载失败型号记录（调用方持有_negative_cache_lock）"""
+    global _negative_cache
+    if _negative_cache is None:
+        _negative_cache = _load_json_file(NEGATIVE_CACHE_FILE, {})
+    return _negative_cache
+
+def _save_negative_cache():
+    """保存失败型号记录（调用方持有_negative_cache_lock）"""
+    try:
+        _save_json_file(NEGATIVE_CACHE_FILE, _negative_cache)
+    except OSError as e:
+        print(f"保存失败型号记录失败: {str(e)}")
+
+def lookup_negative_cache(model):
+    """查询型号的失败记录，没有记录或已过期时返回None
+
+    返回 {'reason': 失败类别, 'time': 记录时间戳, 'url': 最后尝试的地址}
+    """
+    with _negative_cache_lock:
+        entry = _get_negative_cache().get(model)
+    if entry and time.time() - entry.get('time', 0) < NEGATIVE_CACHE_TTL:
+        return entry
+    return None
+
+def record_negative_cache(model, reason, url):
+    """记录查询失败的型号"""
+    with _negative_cache_lock:
+        _get_negative_cache()[model] = {'reason': reason, 'time': time.time(), 'url': url}
+        _save_negative_cache()
+
+def purge_negative_cache(models=None):
+    """删除失败记录（models为None时删除全部），返回删除的条数"""
+    with _negative_cache_lock:
+        cache = _get_negative_cache()
+        if models is None:
+            removed = len(cache)
+            cache.clear()
+        else:
+            removed = sum(1 for model in models if cache.pop(model, None) is not None)
+        if removed:
+            _save_negative_cache()
+    return removed
+
+def describe_negative_entry(model, entry):
+    """生成失败记录的说明文字"""
+    reason = NEGATIVE_REASONS.get(entry.get('reason'), entry.get('reason'))
+    recorded_at = datetime.fromtimestamp(entry.get('time', 0)).strftime('%Y-%m-%d %H:%M')
+    return f"型号 {model} 于 {recorded_at} 查询失败：{reason}\nURL: {entry.get('url', '')}"
+
+def candidate_spec_url_templates(model):
+    """规格页面地址模板的尝试顺序"""
+    # 对于M2D系列和网卡，默认先使用特殊的URL路径
+    if re.match(r'^M2D\d{2}', model) or re.match(r'^[A-Z]\d{2}[A-Z]', model):
+        defaults = [SPEC_URL_TEMPLATES[1]] + SPEC_URL_TEMPLATES[2:]
+    else:
+        defaults = [SPEC_URL_TEMPLATES[0]] + SPEC_URL_TEMPLATES[2:]
+    learned = [lookup_route(model, 'page')]
+    return _ordered_candidates(learned, defaults)
+
+def candidate_photo_sorts(model):
+    """图片sort参数的尝试顺序"""
+    # 根据产品类型选择默认的图片参数
     if re.match(r'^M2D\d{2}', model):  # M2D系列
-        image_url = f"https://www.synology.cn/api/products/getPhoto?product={encoded_model}&type=img&sort=1"
+        default_sort = '1'
     elif re.match(r'^[A-Z]\d{2}[A-Z]', model):  # 网卡和其他PCIe设备
-        image_url = f"https://www.synology.cn/api/products/getPhoto?product={encoded_model}&type=img&sort=0"
+        default_sort = '0'
     else:  # NAS和扩展设备
-        image_url = f"https://www.synology.cn/api/products/getPhoto?product={encoded_model}&type=img&sort=2"
+        default_sort = '2'
+    learned = [lookup_route(model, 'sort')]
+    return _ordered_candidates(learned + [default_sort], PHOTO_SORT_VALUES)
+
+def _run_requests(steps):
+    """用 cached_get 同步执行一个请求流程
+
+    steps 是 _spec_page_steps、_product_image_steps 这样的生成器：产出要请求的地址，
+    由调用方发送请求后把响应送回，请求出错时把异常抛回生成器；生成器的返回值即流程的结果。
+    这样同步版本和异步流水线（_run_requests_async）共用同一套地址尝试和记录逻辑。
+    """
+    try:
+        url = next(steps)
+        while True:
+            try:
+                response = cached_get(url)
+            except requests.exceptions.RequestException as e:
+                url = steps.throw(e)
+            else:
+                url = steps.send(response)
+    except StopIteration as stop:
+        return stop.value
+
+async def _run_requests_async(steps, session):
+    """用 aiohttp 会话在事件循环中执行一个请求流程（见 _run_requests）"""
+    try:
+        url = next(steps)
+        while True:
+            try:
+                response = await synology_http.cached_get_async(session, url)
+            except requests.exceptions.RequestException as e:
+                url = steps.throw(e)
+            else:
+                url = steps.send(response)
+    except StopIteration as stop:
+        return stop.value
+
+def fetch_product_image(model):
+    """下载产品图片的原始数据（只做网络请求和基本检查）
+
+    返回图片字节数据，失败时返回None。本函数可在线程池中并发调用。
+    """
+    return _run_requests(_product_image_steps(model))
+
+def _product_image_steps(model):
+    """下载产品图片的请求流程（见 _run_requests），返回图片字节数据或None"""
+    # 构建图片URL
+    encoded_model = urllib.parse.quote(model)
     
+    # 按已记录的sort参数优先尝试，失败时依次尝试其他sort参数；
+    # 只有返回了有效图片的sort参数才记录为该型号（及其系列）的地址
     try:
-        # 下载图片
-        response = requests.get(image_url, timeout=10)
-        
-        # 检查响应状态码
-        if response.status_code != 200:
-            print(f"下载图片失败，状态码: {response.status_code}")
-            # 如果第一次尝试失败，尝试其他sort参数
-            sort_values = ['0', '1', '2']
-            current_sort = image_url.split('sort=')[1]
-            for sort_value in sort_values:
-                if sort_value != current_sort:
-                    new_url = image_url.replace(f'sort={current_sort}', f'sort={sort_value}')
-                    try:
-                        response = requests.get(new_url, timeout=10)
-                        if response.status_code == 200:
-                            image_url = new_url
-                            break
-                    except:
-                        continue
-            
+        for sort_value in candidate_photo_sorts(model):
+            image_url = PHOTO_URL_TEMPLATE.format(model=encoded_model, sort=sort_value)
+            try:
+                response = yield image_url
+            except requests.exceptions.RequestException as e:
+                print(f"下载图片时出错: {str(e)}")
+                continue
             if response.status_code != 200:
-                return None
-            
-        # 检查内容类型
-        content_type = response.headers.get('content-type', '')
-        if not content_type.startswith('image/'):
-            print(f"返回的内容不是图片: {content_type}")
-            return None
-            
-        # 检查内容长度
-        if len(response.content) < 100:
-            print("返回的图片数据异常")
-            return None
-        
-        try:
-            # 使用PIL打开图片并验证
-            img = PILImage.open(BytesIO(response.content))
-            img.verify()
-            
-            # 重新打开图片（verify后需要重新打开）
-            img = PILImage.open(BytesIO(response.content))
-            
-            # 检查图片尺寸
-            if img.size[0] < 10 or img.size[1] < 10:
-                print("图片尺寸异常")
-                return None
-            
-            # 保存原始图片到本地
-            original_path = os.path.join(IMAGES_DIR, f"{model}.png")
-            img.save(original_path, format='PNG')
-            print(f"原始图片已保存到: {original_path}")
-            
-            # 计算等比例缩放后的高度（Excel中显示用）
-            width = 140  # 调整Excel中显示的图片宽度
-            ratio = width / float(img.size[0])
-            height = int(float(img.size[1]) * ratio)
+                print(f"下载图片失败，状态码: {response.status_code}")
+                continue
             
-            # 调整图片大小
-            img_resized = img.resize((width, height), PILImage.Resampling.LANCZOS)
+            # 检查内容类型
+            content_type = response.headers.get('content-type', '')
+            if not content_type.startswith('image/'):
+                print(f"返回的内容不是图片: {content_type}")
+                continue
             
-            # 将调整后的图片保存到内存中
-            img_byte_arr = BytesIO()
-            img_resized.save(img_byte_arr, format='PNG')
-            img_byte_arr.seek(0)
+            # 检查内容长度
+            if len(response.content) < 100:
+                print("返回的图片数据异常")
+                continue
             
-            return img_byte_arr, height  # 返回图片数据和高度
+            record_route(model, 'sort', sort_value)
+            return response.content
+        
+        return None
             
-        except (IOError, OSError) as e:
-            print(f"处理图片时出错: {str(e)}")
+    except Exception as e:
+        print(f"发生未知错误: {str(e)}")
+        return None
+
+ThumbnailOptions = namedtuple('ThumbnailOptions', ['width', 'transparency', 'format', 'quality'])
+
+def thumbnail_options(width=None, transparency=None, fmt=None, quality=None):
+    """生成缩略图参数，参数为None时使用 THUMBNAIL_WIDTH 等模块设置
+
+    JPEG不支持透明，需要透明背景时改用调色板PNG；质量只对JPEG有效。
+    """
+    width = THUMBNAIL_WIDTH if width is None else width
+    transparency = TRANSPARENT_TOLERANCE if transparency is None else transparency
+    fmt = THUMBNAIL_FORMAT if fmt is None else fmt
+    if fmt not in THUMBNAIL_FORMATS:
+        raise ValueError(f"不支持的缩略图格式: {fmt}（可选: {', '.join(THUMBNAIL_FORMATS)}）")
+    if fmt == 'jpeg' and transparency is not None:
+        fmt = 'png8'
+    if fmt == 'jpeg':
+        quality = THUMBNAIL_JPEG_QUALITY if quality is None else quality
+    else:
+        quality = None
+    return ThumbnailOptions(width, transparency, fmt, quality)
+
+_image_index = None
+_image_index_lock = threading.Lock()
+
+def _get_image_index():
+    # 调用方需持有 _image_index_lock
+    global _image_index
+    if _image_index is None:
+        _image_index = _load_json_file(IMAGE_INDEX_FILE, {})
+    return _image_index
+
+def _original_image_path(digest):
+    return os.path.join(ORIGINALS_DIR, f"{digest}.png")
+
+def product_image_path(model):
+    """型号原图的本地路径，没有保存过时返回None"""
+    with _image_index_lock:
+        digest = _get_image_index().get(model)
+    if digest is None:
+        return None
+    path = _original_image_path(digest)
+    return path if os.path.exists(path) else None
+
+def _record_image_source(model, digest):
+    """记录型号对应的图片内容哈希"""
+    with _image_index_lock:
+        index = _get_image_index()
+        if index.get(model) != digest:
+            index[model] = digest
+            _save_json_file(IMAGE_INDEX_FILE, index)
+
+def _thumbnail_path(digest, options):
+    # 不同宽度、透明处理和格式的缩略图分别缓存
+    name = f"{digest}_{options.width}"
+    if options.transparency is not None:
+        name += f"_t{options.transparency}"
+    if options.format == 'jpeg':
+        name += f"_q{options.quality}.jpg"
+    elif options.format == 'png8':
+        name += "_p8.png"
+    else:
+        name += ".png"
+    return os.path.join(THUMBNAIL_DIR, name)
+
+def _load_thumbnail(digest, options):
+    """读取缓存的缩略图，返回 (图片数据, 高度)，没有缓存时返回None"""
+    path = _thumbnail_path(digest, options)
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+        # 只读取文件头中的尺寸，不解码图片
+        height = PILImage.open(BytesIO(data)).size[1]
+    except (OSError, PILImage.UnidentifiedImageError):
+        return None
+    return BytesIO(data), height
+
+def _save_thumbnail(digest, options, data):
+    """保存缩略图到缓存"""
+    ensure_dir(THUMBNAIL_DIR)
+    write_atomic(_thumbnail_path(digest, options), data)
+
+def _encode_thumbnail(img, options):
+    """按缩略图格式编码图片，返回图片数据"""
+    output = BytesIO()
+    has_alpha = img.mode in ('RGBA', 'LA', 'PA') or 'transparency' in img.info
+    if options.format == 'jpeg':
+        # JPEG没有透明通道，透明部分填充为白色
+        img = img.convert('RGBA') if has_alpha else img.convert('RGB')
+        if has_alpha:
+            background = PILImage.new('RGB', img.size, (255, 255, 255))
+            background.paste(img, mask=img.getchannel('A'))
+            img = background
+        img.save(output, format='JPEG', quality=options.quality, optimize=True)
+    elif options.format == 'png8':
+        # 量化为256色调色板PNG，带透明通道的图片只能使用八叉树量化
+        if has_alpha:
+            img = img.convert('RGBA').quantize(colors=256, method=PILImage.Quantize.FASTOCTREE)
+        else:
+            img = img.convert('RGB').quantize(colors=256)
+        img.save(output, format='PNG', optimize=True)
+    else:
+        img.save(output, format='PNG')
+    return output.getvalue()
+
+def normalize_image(content, options=None, original_path=None):
+    """解码图片并缩放为Excel中显示的尺寸
+
+    只使用参数和返回值传递数据，可以在子进程中运行（见 ImagePipeline）。
+    original_path 不为空时同时把原图保存为PNG（原图不做透明处理）。
+    返回 (缩略图数据, 高度)，图片无效时返回None。
+    """
+    if options is None:
+        options = thumbnail_options()
+    width = options.width
+    try:
+        # 使用PIL打开并完整解码图片（损坏的图片在这里报错）
+        img = PILImage.open(BytesIO(content))
+        img.load()
+        
+        # 检查图片尺寸
+        if img.size[0] < 10 or img.size[1] < 10:
+            print("图片尺寸异常")
             return None
-            
-    except requests.exceptions.RequestException as e:
-        print(f"下载图片时出错: {str(e)}")
+        
+        # 保存原始图片到本地
+        if original_path:
+            original = BytesIO()
+            img.save(original, format='PNG')
+            write_atomic(original_path, original.getvalue())
+            print(f"原始图片已保存到: {original_path}")
+        
+        # 计算等比例缩放后的高度（Excel中显示用）
+        ratio = width / float(img.size[0])
+        height = int(float(img.size[1]) * ratio)
+        
+        if options.transparency is not None:
+            img = make_background_transparent(img, options.transparency)
+        
+        # 调整图片大小
+        img_resized = img.resize((width, height), PILImage.Resampling.LANCZOS)
+        return _encode_thumbnail(img_resized, options), height
+        
+    except (IOError, OSError) as e:
+        print(f"处理图片时出错: {str(e)}")
         return None
     except Exception as e:
         print(f"发生未知错误: {str(e)}")
         return None
 
-def format_worksheet(worksheet, df, model):
-    """设置工作表格式"""
+def _prepare_product_image(model, content, options):
+    """检查图片缓存，返回 (内容哈希, 需要保存的原图路径或None, 缓存的缩略图或None)
+
+    原图和缩略图都按图片内容的哈希保存，同一系列共用的图片只保存、处理一次。
+    原图已保存且缩略图已缓存时，不需要再解码、缩放。
+    """
+    digest = hashlib.sha256(content).hexdigest()
+    original_path = _original_image_path(digest)
+    if os.path.exists(original_path):
+        original_path = None
+        cached = _load_thumbnail(digest, options)
+    else:
+        cached = None
+    if cached is not None:
+        _record_image_source(model, digest)
+    return digest, original_path, cached
+
+def _finish_product_image(model, digest, options, result):
+    """记录图片处理结果（型号对应的图片哈希、缩略图缓存），返回 (图片数据, 高度)"""
+    if result is None:
+        return None
+    data, height = result
+    _record_image_source(model, digest)
+    try:
+        _save_thumbnail(digest, options, data)
+    except OSError as e:
+        print(f"保存缩略图缓存失败: {str(e)}")
+    return BytesIO(data), height  # 返回图片数据和高度
+
+def process_product_image(model, content, options=None):
+    """将下载的图片保存到本地并缩放为Excel中显示的尺寸
+
+    原图保存为 产品图片/originals/{内容哈希}.png，型号与哈希的对应关系记录在
+    image_index.json 中。缩略图按内容哈希和 options 缓存：图片已处理过时直接使用缓存，
+    不解码、不缩放。需要处理时图片只解码一次。
+    返回 (图片数据, 高度)，失败时返回None。
+    """
+    # 确保图片目录存在
+    ensure_dir(ORIGINALS_DIR)
+    
+    if options is None:
+        options = thumbnail_options()
+    digest, original_path, cached = _prepare_product_image(model, content, options)
+    if cached is not None:
+        return cached
+    
+    result = normalize_image(content, options, original_path)
+    return _finish_product_image(model, digest, options, result)
+
+def load_local_product_image(model, options=None):
+    """只用本地文件获取型号的缩略图，不发送网络请求
+
+    优先使用缓存的缩略图；没有对应参数的缓存时由保存的原图重新生成并缓存。
+    返回 (图片数据, 高度)，型号没有本地图片时返回None。
+    """
+    if options is None:
+        options = thumbnail_options()
+    with _image_index_lock:
+        digest = _get_image_index().get(model)
+    if digest is None:
+        return None
+    cached = _load_thumbnail(digest, options)
+    if cached is not None:
+        return cached
+    
+    try:
+        with open(_original_image_path(digest), 'rb') as f:
+            content = f.read()
+    except OSError:
+        return None
+    return _finish_product_image(model, digest, options, normalize_image(content, options))
+
+class ImagePipeline:
+    """批量查询的图片处理阶段
+
+    图片的解码、缩放和编码是CPU密集型操作，在线程中执行会互相争抢GIL。
+    submit() 把需要处理的图片交给进程池（已缓存的直接使用缓存），
+    get() 在写入工作表时取出对应型号的结果，其他图片继续在后台处理。
+    内容相同的图片只处理一次。进程池无法使用时改为在当前进程中处理。
+    """
+
+    def __init__(self, processes=None, options=None):
+        """processes、options 为None时使用 IMAGE_PROCESSES 和 thumbnail_options() 的设置"""
+        self.processes = IMAGE_PROCESSES if processes is None else processes
+        self.options = thumbnail_options() if options is None else options
+        self._executor = None
+        self._results = {}  # 型号 -> 处理结果
+        self._pending = {}  # 型号 -> (哈希, 图片数据, 原图路径, Future)
+        self._futures = {}  # 哈希 -> Future（同一批中内容相同的图片共用）
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _get_executor(self):
+        if self._executor is None and self.processes != 0:
+            try:
+                # 进程池在下载线程运行时才创建；用fork启动时子进程可能继承其他线程持有的锁
+                # （如标准输出的锁）而卡死，因此统一用spawn启动（Windows的默认方式）
+                self._executor = ProcessPoolExecutor(max_workers=self.processes,
+                                                     mp_context=multiprocessing.get_context('spawn'))
+            except (OSError, NotImplementedError, ValueError) as e:
+                print(f"无法启动图片处理进程池，改为在当前进程中处理: {str(e)}")
+                self.processes = 0
+        return self._executor
+
+    def submit(self, model, content):
+        """提交一个型号的图片数据"""
+        ensure_dir(ORIGINALS_DIR)
+        digest, original_path, cached = _prepare_product_image(model, content, self.options)
+        if cached is not None:
+            self._results[model] = cached
+            return
+        
+        future = self._futures.get(digest)
+        if future is None:
+            executor = self._get_executor()
+            if executor is not None:
+                try:
+                    future = executor.submit(normalize_image, content, self.options, original_path)
+                    self._futures[digest] = future
+                except RuntimeError as e:  # 进程池已损坏
+                    print(f"提交图片处理任务失败，改为在当前进程中处理: {str(e)}")
+        if future is None:
+            result = normalize_image(content, self.options, original_path)
+            self._results[model] = _finish_product_image(model, digest, self.options, result)
+        else:
+            self._pending[model] = (digest, content, original_path, future)
+
+    def get(self, model, default=None):
+        """取出一个型号的处理结果 (图片数据, 高度)，必要时等待其完成"""
+        if model in self._pending:
+            digest, content, original_path, future = self._pending.pop(model)
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"图片处理进程出错，改为在当前进程中处理: {str(e)}")
+                result = normalize_image(content, self.options, original_path)
+            self._results[model] = _finish_product_image(model, digest, self.options, result)
+        return self._results.get(model, default)
+
+    def close(self):
+        """等待未取出的任务完成并关闭进程池"""
+        for model in list(self._pending):
+            self.get(model)
+        self._futures.clear()
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+def download_and_resize_image(model, content=None):
+    """下载并调整产品图片大小，同时保存到本地
+
+    content 为已下载的图片数据时跳过下载。
+    """
+    if content is None:
+        content = fetch_product_image(model)
+        if content is None:
+            return None
+    return process_product_image(model, content)
+
+def register_spec_styles(workbook):
+    """在工作簿中注册规格表使用的命名样式（已存在的不重复注册）"""
+    existing = set(workbook.named_styles)
+    for name, (font, alignment) in SPEC_CELL_STYLES.items():
+        if name not in existing:
+            style = NamedStyle(name=name)
+            style.font = copy(font)
+            style.alignment = copy(alignment)
+            style.border = copy(NORMAL_BORDER)
+            workbook.add_named_style(style)
+
+def insert_product_image(worksheet, img_result):
+    """在A1单元格插入产品图片并清除占位文字，成功时返回True"""
+    img_data, img_height = img_result
+    try:
+        # 在A1单元格插入图片
+        img = Image(img_data)
+        # 设置图片位置（A1单元格内）
+        img.anchor = 'A1'
+        worksheet.add_image(img)
+    except Exception as e:
+        print(f"插入图片时出错: {str(e)}")
+        return False
+    
+    placeholder = worksheet[IMAGE_PLACEHOLDER_CELL]
+    if placeholder.value == IMAGE_PLACEHOLDER:
+        placeholder.value = None
+        placeholder.style = 'Normal'
+    return True
+
+def _write_image_placeholder(worksheet):
+    """没有图片时写入占位文字，之后由 attach_missing_images 补充图片"""
+    placeholder = worksheet[IMAGE_PLACEHOLDER_CELL]
+    placeholder.value = IMAGE_PLACEHOLDER
+    placeholder.font = Font(color="808080", italic=True)
+    placeholder.alignment = Alignment(horizontal='center', vertical='center')
+
+def format_worksheet(worksheet, df, model, image_result=None, fetch_image=True):
+    """设置工作表格式
+
+    Args:
+        image_result: 已处理好的图片 (图片数据, 高度)
+        fetch_image: image_result为空时是否下载图片
+    """
     # 设置第一行高度为固定值
     worksheet.row_dimensions[1].height = 120
     
-    # 下载并插入产品图片
-    img_result = download_and_resize_image(model)
-    if img_result:
-        img_data, img_height = img_result
-        try:
-            # 在A1单元格插入图片
-            img = Image(img_data)
-            # 设置图片位置（A1单元格内）
-            img.anchor = 'A1'
-            worksheet.add_image(img)
-        except Exception as e:
-            print(f"插入图片时出错: {str(e)}")
+    # 下载并插入产品图片（没有图片时显示占位文字）
+    img_result = image_result
+    if img_result is None and fetch_image:
+        img_result = download_and_resize_image(model)
+    if not (img_result and insert_product_image(worksheet, img_result)):
+        _write_image_placeholder(worksheet)
     
     # 先取消所有合并的单元格
     # 创建合并范围的列表副本
@@ -334,7 +869,12 @@ def format_worksheet(worksheet, df, model):
     last_category = None
     category_rows = []  # 存储每个大类的起始行号
     
-    # 处理数据行
+    # 注册规格表样式，并一次性取好各列宽度
+    register_spec_styles(worksheet.parent)
+    col_widths = {col: worksheet.column_dimensions[get_column_letter(col)].width
+                  for col in range(1, worksheet.max_column + 1)}
+    
+    # 处理数据行（格式和行高在同一次遍历中完成）
     for row_idx, row in enumerate(worksheet.iter_rows(min_row=3, max_row=worksheet.max_row), start=3):
         cell_value = row[0].value
         if cell_value:  # 如果第一列有值，说明是新的大类
@@ -342,34 +882,21 @@ def format_worksheet(worksheet, df, model):
             category_rows.append(row_idx)
             last_category = cell_value
             # 设置大类单元格格式
-            row[0].font = Font(bold=True)
-            row[0].alignment = Alignment(horizontal='left', vertical='center', wrap_text=True)
+            row[0].style = 'spec_category'
         else:
-            # 对于大类下的子项，缩进第二列
-            if row[1].value:
-                row[1].alignment = Alignment(horizontal='left', vertical='center', indent=1, wrap_text=True)
+            row[0].style = 'spec_plain'
         
-        # 设置规格值列的对齐方式和自动换行
-        if row[2].value:
-            row[2].alignment = Alignment(horizontal='left', vertical='center', wrap_text=True)
+        # 对于大类下的子项，缩进第二列
+        if not cell_value and row[1].value:
+            row[1].style = 'spec_subitem'
+        else:
+            row[1].style = 'spec_plain'
         
-        # 只为前三列添加边框
-        for cell in row[:3]:
-            cell.border = NORMAL_BORDER
-            # 确保所有单元格都启用自动换行
-            if cell.alignment:
-                new_alignment = Alignment(
-                    horizontal=cell.alignment.horizontal,
-                    vertical=cell.alignment.vertical,
-                    wrap_text=True,
-                    indent=cell.alignment.indent
-                )
-                cell.alignment = new_alignment
-            else:
-                cell.alignment = Alignment(horizontal='left', vertical='center', wrap_text=True)
+        # 设置规格值列的对齐方式
+        row[2].style = 'spec_value' if row[2].value else 'spec_plain'
         
         # 设置行高
-        row_height = calculate_row_height(row)
+        row_height = calculate_row_height(row, col_widths)
         worksheet.row_dimensions[row_idx].height = row_height
     
     # 设置打印相关属性
@@ -379,21 +906,178 @@ def format_worksheet(worksheet, df, model):
     worksheet.page_setup.fitToHeight = False
     worksheet.page_setup.fitToWidth = 1
 
-def create_or_update_summary_sheet(workbook, model=None, sort_by=None, sort_ascending=None):
-    """创建或更新产品汇总表"""
+def _write_summary_row(summary_sheet, row, index, product):
+    """写入汇总表的一行（序号、带超链接的型号、添加时间、备注）"""
+    # 序号
+    summary_sheet.cell(row=row, column=1, value=index)
+    
+    # 产品型号（添加超链接）
+    cell = summary_sheet.cell(row=row, column=2)
+    cell.value = product['name']
+    cell.hyperlink = Hyperlink(
+        display=product['name'],
+        ref=f"A{row}",
+        location=f"'{product['name']}'!A1",
+        target=f"#{product['name']}!A1"
+    )
+    cell.font = Font(color="0563C1", underline="single")
+    
+    # 添加时间
+    summary_sheet.cell(row=row, column=3, value=product['time'])
+    
+    # 添加备注
+    summary_sheet.cell(row=row, column=4, value=product['note'])
+    
+    # 设置单元格边框和对齐方式；数据行不锁定，以便在Excel中排序和编辑备注
+    for col in range(1, 5):
+        cell = summary_sheet.cell(row=row, column=col)
+        cell.border = NORMAL_BORDER
+        cell.alignment = Alignment(horizontal='center', vertical='center')
+        cell.protection = Protection(locked=False)
+
+def _summary_table_ref(row_count):
+    """汇总表格的范围（表头加数据行，没有数据时保留一个空行）"""
+    return f"A1:D{max(row_count, 1) + 1}"
+
+def _setup_summary_table(summary_sheet, row_count):
+    """设置汇总表格的范围和工作表保护
+
+    汇总表是一个带自动筛选的Excel表格，在Excel中点击表头的筛选按钮即可排序和筛选，
+    程序不再为排序重写工作簿。旧版汇总表（表头带▲/▼排序标记和排序按钮）在这里转换为表格。
+    """
+    ref = _summary_table_ref(row_count)
+    table = summary_sheet.tables.get(SUMMARY_TABLE)
+    if table is None:
+        for col, header in enumerate(SUMMARY_HEADERS, 1):
+            cell = summary_sheet.cell(row=1, column=col)
+            cell.value = header
+            cell.hyperlink = None
+        # 删除旧版的排序按钮
+        for col in (6, 7):
+            summary_sheet.cell(row=1, column=col).value = None
+        summary_sheet['E1'].value = SUMMARY_NOTE
+        # 旧版写入的数据行是锁定的；受保护工作表中含锁定单元格的区域无法排序
+        for row in summary_sheet.iter_rows(min_row=2, max_row=max(row_count, 1) + 1, max_col=4):
+            for cell in row:
+                cell.protection = Protection(locked=False)
+        
+        table = Table(displayName=SUMMARY_TABLE, ref=ref)
+        table.tableStyleInfo = TableStyleInfo(name="TableStyleLight1", showRowStripes=False)
+        summary_sheet.add_table(table)
+    else:
+        table.ref = ref
+        if table.autoFilter is not None:
+            table.autoFilter.ref = ref
+            table.autoFilter.sortState = None
+        # 行已由程序重新排列，Excel中保存的排序状态不再适用
+        table.sortState = None
+    
+    # 保护工作表：表头和表格以外的单元格不可修改，允许使用筛选按钮排序和筛选
+    summary_sheet.protection.sheet = True
+    summary_sheet.protection.autoFilter = False
+    summary_sheet.protection.sort = False
+    summary_sheet.protection.enable()
+
+def _renumber_summary_rows(summary_sheet, start_row):
+    """插入行之后，更新start_row及以下各行的序号和超链接位置
+
+    openpyxl移动行时不会更新超链接记录的单元格位置，需要在这里修正。
+    """
+    for row in range(start_row, summary_sheet.max_row + 1):
+        if summary_sheet.cell(row=row, column=2).value is None:
+            continue
+        summary_sheet.cell(row=row, column=1).value = row - 1
+        cell = summary_sheet.cell(row=row, column=2)
+        if cell.hyperlink is not None:
+            cell.hyperlink.ref = cell.coordinate
+
+def _update_summary_rows(summary_sheet, product_sheets, current_models, product_times):
+    """增量更新汇总表：只插入或更新指定型号所在的行，其他行保持不变
+
+    新型号插入到按型号排序的位置，这要求现有的行已按型号排序；在Excel中用筛选按钮排序后
+    行的顺序会改变。现有行未按型号排序，或汇总表的产品与工作表不一致时返回False，由调用方完整重建。
+    """
+    names = [row[0] for row in summary_sheet.iter_rows(
+        min_row=2, min_col=2, max_col=2, values_only=True)]
+    while names and names[-1] is None:
+        names.pop()
+    if None in names or set(names) | current_models != set(product_sheets):
+        return False
+    if names != sorted(names):
+        # 行已在Excel中重新排序，无法确定插入位置
+        return False
+    
+    for model in sorted(current_models):
+        time_value = product_times.get(model) or datetime.now().strftime('%Y-%m-%d %H:%M')
+        if model in names:
+            # 已有的型号只更新时间
+            summary_sheet.cell(row=names.index(model) + 2, column=3).value = time_value
+            continue
+        
+        # 找到插入位置：排在第一个型号大于它的产品之前
+        position = next((i for i, name in enumerate(names) if name > model), len(names))
+        row = position + 2
+        if position < len(names):
+            summary_sheet.insert_rows(row)
+        names.insert(position, model)
+        _write_summary_row(summary_sheet, row, position + 1,
+                           {'name': model, 'time': time_value, 'note': ''})
+        _renumber_summary_rows(summary_sheet, row + 1)
+    
+    _setup_summary_table(summary_sheet, len(names))
+    return True
+
+def _collect_summary_products(product_sheets, existing_data, current_models, product_times):
+    """汇总表各行的数据（型号、添加时间、备注），按产品型号排序"""
+    products_data = []
+    for sheet_name in product_sheets:
+        # 如果是当前添加的产品，使用当前时间
+        is_current_product = (sheet_name in current_models)
+        
+        # 获取或设置时间
+        if sheet_name in product_times:
+            time_value = product_times[sheet_name]
+        elif is_current_product:
+            time_value = datetime.now().strftime('%Y-%m-%d %H:%M')
+        elif sheet_name in existing_data:
+            time_value = existing_data[sheet_name]['time']
+        else:
+            time_value = datetime.now().strftime('%Y-%m-%d %H:%M')
+        
+        # 获取备注
+        note = existing_data.get(sheet_name, {}).get('note', '')
+        
+        products_data.append({
+            'name': sheet_name,
+            'time': time_value,
+            'note': note
+        })
+    
+    # 按产品型号排序（其他排序方式在Excel中通过筛选按钮完成）
+    products_data.sort(key=lambda x: x['name'])
+    return products_data
+
+def create_or_update_summary_sheet(workbook, model=None, product_times=None, rebuild=False):
+    """创建或更新产品汇总表
+
+    model 可以是单个型号或型号列表，这些型号的添加时间会更新为当前时间
+    （product_times 中指定了时间的型号使用指定时间）。
+
+    指定了 model 时只插入或更新这些型号的行；rebuild=True 或汇总表与工作表不一致时，
+    完整重建汇总表。
+    """
+    product_times = product_times or {}
+    if isinstance(model, str):
+        current_models = {model}
+    else:
+        current_models = set(model or [])
+    
     # 如果汇总表不存在，创建它
     if SUMMARY_SHEET not in workbook.sheetnames:
         summary_sheet = workbook.create_sheet(SUMMARY_SHEET, 0)  # 在最前面创建
         
-        # 添加排序按钮
-        summary_sheet.cell(row=1, column=6, value="▼").font = Font(bold=True)  # F1: 降序按钮
-        summary_sheet.cell(row=1, column=7, value="▲").font = Font(bold=True)  # G1: 升序按钮
-        summary_sheet.column_dimensions['F'].width = 5  # 设置按钮列宽
-        summary_sheet.column_dimensions['G'].width = 5
-        
         # 设置表头
-        headers = ['序号', '产品型号', '添加时间', '备注']
-        for col, header in enumerate(headers, 1):
+        for col, header in enumerate(SUMMARY_HEADERS, 1):
             cell = summary_sheet.cell(row=1, column=col)
             cell.value = header
             cell.font = Font(bold=True)
@@ -411,7 +1095,7 @@ def create_or_update_summary_sheet(workbook, model=None, sort_by=None, sort_asce
         
         # 添加排序说明
         sort_note = summary_sheet.cell(row=1, column=5)  # E1单元格
-        sort_note.value = '使用程序界面的排序按钮进行排序'
+        sort_note.value = SUMMARY_NOTE
         sort_note.font = Font(color="808080", italic=True)  # 灰色斜体
         summary_sheet.column_dimensions['E'].width = 35  # 设置说明列宽
         
@@ -421,6 +1105,10 @@ def create_or_update_summary_sheet(workbook, model=None, sort_by=None, sort_asce
     # 获取所有产品工作表（排除汇总表）
     product_sheets = [sheet for sheet in workbook.sheetnames if sheet != SUMMARY_SHEET]
     
+    if not rebuild and current_models:
+        if _update_summary_rows(summary_sheet, product_sheets, current_models, product_times):
+            return
+    
     # 收集现有数据（包括时间和备注）
     existing_data = {}
     for row in range(2, summary_sheet.max_row + 1):
@@ -439,99 +1127,97 @@ def create_or_update_summary_sheet(workbook, model=None, sort_by=None, sort_asce
             cell.hyperlink = None  # 清除超链接
     
     # 收集所有产品数据
-    products_data = []
-    for sheet_name in product_sheets:
-        # 如果是当前添加的产品，使用当前时间
-        is_current_product = (sheet_name == model)
-        
-        # 获取或设置时间
-        if is_current_product:
-            time_value = datetime.now().strftime('%Y-%m-%d %H:%M')
-        elif sheet_name in existing_data:
-            time_value = existing_data[sheet_name]['time']
-        else:
-            time_value = datetime.now().strftime('%Y-%m-%d %H:%M')
-        
-        # 获取备注
-        note = existing_data.get(sheet_name, {}).get('note', '')
-        
-        products_data.append({
-            'name': sheet_name,
-            'time': time_value,
-            'note': note
-        })
+    products_data = _collect_summary_products(product_sheets, existing_data, current_models, product_times)
     
-    # 排序数据
-    if sort_by == 'name':
-        products_data.sort(key=lambda x: x['name'], reverse=not sort_ascending)
-    elif sort_by == 'time':
-        products_data.sort(key=lambda x: x['time'], reverse=not sort_ascending)
-    else:
-        # 默认按产品型号排序
-        products_data.sort(key=lambda x: x['name'])
-    
-    # 更新表头文本
-    model_header = summary_sheet['B1']
-    time_header = summary_sheet['C1']
-    
-    if sort_by == 'name':
-        model_header.value = f"产品型号 {'▲' if sort_ascending else '▼'}"
-        time_header.value = "添加时间"
-    elif sort_by == 'time':
-        model_header.value = "产品型号"
-        time_header.value = f"添加时间 {'▲' if sort_ascending else '▼'}"
-    else:
-        model_header.value = "产品型号"
-        time_header.value = "添加时间"
+    # 重新添加所有产品
+    for idx, product in enumerate(products_data, 1):
+        _write_summary_row(summary_sheet, idx + 1, idx, product)
+    
+    _setup_summary_table(summary_sheet, len(products_data))
+
+def rewrite_summary_sheet(excel_file=None):
+    """在压缩包层面重建汇总表，不加载其他工作表
+
+    只读取汇总表和工作表列表，重新生成汇总表的单元格、超链接和表格范围，其他工作表原样复制。
+    单元格沿用汇总表第一行数据的样式，因此汇总表不存在、没有数据行或还不是表格（旧版文件）时
+    返回False，由调用方改用openpyxl完整重建。
+    """
+    excel_file = excel_file or EXCEL_FILE
+    if SUMMARY_TABLE not in read_sheet_tables(excel_file, SUMMARY_SHEET):
+        return False
+    sheet = read_sheet(excel_file, SUMMARY_SHEET)
+    if sheet is None:
+        return False
+    cells, links = sheet
+    template = [cells.get((2, col)) for col in range(1, 5)]
+    if None in template:
+        return False
     
-    # 设置字体样式
-    model_header.font = Font(bold=True)
-    time_header.font = Font(bold=True)
+    product_sheets = [name for name in get_sheet_names(excel_file) if name != SUMMARY_SHEET]
+    
+    # 收集现有数据（包括时间和备注），保留原单元格以沿用其样式
+    existing_cells = {}
+    existing_data = {}
+    for (row, col), cell in cells.items():
+        if row >= 2 and col == 2 and cell.value:
+            time_cell, note_cell = cells.get((row, 3)), cells.get((row, 4))
+            existing_cells[cell.value] = (time_cell, note_cell)
+            existing_data[cell.value] = {
+                'time': time_cell.value if time_cell else None,
+                'note': note_cell.value if note_cell else None
+            }
+    
+    products_data = _collect_summary_products(product_sheets, existing_data, set(), {})
+    
+    # 表头和前4列以外的单元格保持不变
+    new_cells = {key: cell for key, cell in cells.items() if key[0] == 1 or key[1] > 4}
+    new_links = []
+    for link in links:
+        column, row = coordinate_from_string(link.ref.split(':')[0])
+        if row == 1 or column_index_from_string(column) > 4:
+            new_links.append(link)
     
-    # 重新添加所有产品
     for idx, product in enumerate(products_data, 1):
-        # 序号
-        summary_sheet.cell(row=idx+1, column=1, value=idx)
-        
-        # 产品型号（添加超链接）
-        cell = summary_sheet.cell(row=idx+1, column=2)
-        cell.value = product['name']
-        cell.hyperlink = Hyperlink(
-            display=product['name'],
-            ref=f"A{idx+1}",
-            location=f"'{product['name']}'!A1",
-            target=f"#{product['name']}!A1"
-        )
-        cell.font = Font(color="0563C1", underline="single")
-        
-        # 添加时间
-        summary_sheet.cell(row=idx+1, column=3, value=product['time'])
-        
-        # 添加备注
-        summary_sheet.cell(row=idx+1, column=4, value=product['note'])
-        
-        # 设置单元格边框和对齐方式
-        for col in range(1, 5):
-            cell = summary_sheet.cell(row=idx+1, column=col)
-            cell.border = NORMAL_BORDER
-            cell.alignment = Alignment(horizontal='center', vertical='center')
+        row = idx + 1
+        name = product['name']
+        time_cell, note_cell = existing_cells.get(name, (None, None))
+        new_cells[(row, 1)] = SheetCell(idx, template[0].style)
+        new_cells[(row, 2)] = SheetCell(name, template[1].style)
+        new_cells[(row, 3)] = SheetCell(product['time'], (time_cell or template[2]).style)
+        new_cells[(row, 4)] = SheetCell(product['note'], (note_cell or template[3]).style)
+        new_links.append(SheetHyperlink(ref=f"B{row}", target=f"#{name}!A1", location=f"'{name}'!A1",
+                                        display=name, tooltip=None))
+    if not products_data:
+        # 表格至少保留一个数据行
+        for col, cell in enumerate(template, 1):
+            new_cells[(2, col)] = SheetCell(None, cell.style)
     
-    # 保护工作表，只允许点击超链接和编辑备注
-    summary_sheet.protection.sheet = True
-    summary_sheet.protection.enable()
+    return patch_sheet(excel_file, SUMMARY_SHEET, new_cells, new_links,
+                       table_refs={SUMMARY_TABLE: _summary_table_ref(len(products_data))})
 
 def update_all_summary():
-    """更新所有已有产品的汇总表"""
+    """更新所有已有产品的汇总表
+
+    优先只改写汇总表；无法直接改写时加载整个工作簿重建。
+    """
     try:
         if not os.path.exists(EXCEL_FILE):
             return False, "Excel文件不存在"
         
+        try:
+            if rewrite_summary_sheet(EXCEL_FILE):
+                return True, "汇总表更新成功"
+        except OSError as e:
+            return False, f"保存Excel文件时出错: {str(e)}"
+        except Exception as e:
+            print(f"直接改写汇总表失败，改为重建工作簿: {str(e)}")
+        
         try:
             workbook = load_workbook(EXCEL_FILE)
         except Exception as e:
             return False, f"无法打开Excel文件: {str(e)}"
         
-        create_or_update_summary_sheet(workbook)
+        create_or_update_summary_sheet(workbook, rebuild=True)
         
         try:
             workbook.save(EXCEL_FILE)
@@ -543,236 +1229,481 @@ def update_all_summary():
     except Exception as e:
         return False, f"更新汇总表时出错: {str(e)}"
 
-def get_product_specs(model):
+def fetch_spec_page(model):
+    """下载产品规格页面（只做网络请求）
+
+    返回 (True, (页面HTML, 实际URL)) 或 (False, 错误信息)。
+    """
+    return _run_requests(_spec_page_steps(model))
+
+def _spec_page_steps(model):
+    """下载产品规格页面的请求流程（见 _run_requests），返回值与 fetch_spec_page 相同"""
     # 首先验证产品型号格式
     is_valid, error_message = validate_model_number(model)
     if not is_valid:
         return False, error_message
 
-    # 构建URL - 直接使用完整路径
-    base_url = "https://www.synology.cn/zh-cn/products/"
-    
-    # 对于M2D系列和网卡，使用特殊的URL路径
-    if re.match(r'^M2D\d{2}', model) or re.match(r'^[A-Z]\d{2}[A-Z]', model):
-        base_url = "https://www.synology.cn/zh-cn/products/M2_PCIe_Card/"
-    
-    url = base_url + model + "#specs"
+    # 按已记录的地址优先尝试；主地址返回404时依次尝试其他可能的地址
+    candidates = candidate_spec_url_templates(model)
+    url = candidates[0].format(model=model)
     
     try:
-        # 发送请求
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        response = requests.get(url, headers=headers)
-        
-        # 如果主URL返回404，尝试其他可能的URL
-        if response.status_code == 404:
-            # 尝试不同的URL路径
-            alternate_urls = [
-                f"https://www.synology.cn/zh-cn/products/{model}",  # 无#specs后缀
-                f"https://www.synology.cn/zh-cn/products/M2_PCIe_Card/{model}",  # M2D系列路径
-                f"https://www.synology.cn/zh-cn/products/network/{model}",  # 网卡路径
-                f"https://www.synology.cn/zh-cn/products/PCIe_Card/{model}"  # PCIe卡通用路径
-            ]
+        response = None
+        error = None
+        outcomes = []
+        tried = set()
+        for template in candidates:
+            candidate_url = template.format(model=model)
+            # 锚点不同的地址是同一个页面，无需重复请求
+            page = urllib.parse.urldefrag(candidate_url)[0]
+            if page in tried:
+                continue
+            tried.add(page)
             
-            for alt_url in alternate_urls:
-                try:
-                    response = requests.get(alt_url, headers=headers)
-                    if response.status_code == 200:
-                        url = alt_url  # 更新为成功的URL
-                        break
-                except:
-                    continue
+            try:
+                # 发送请求（复用连接，有缓存时只做条件请求）
+                candidate_response = yield candidate_url
+            except requests.exceptions.RequestException as e:
+                outcomes.append('error')
+                if error is None:
+                    error = e
+                continue
+            
+            outcomes.append(candidate_response.status_code)
+            # 优先保留非404的响应，错误信息能反映真正的失败原因
+            if (response is None or candidate_response.status_code == 200
+                    or response.status_code == 404):
+                response = candidate_response
+                url = candidate_url
+            if candidate_response.status_code == 200:
+                record_route(model, 'page', template)
+                break
+            if len(tried) == 1 and candidate_response.status_code != 404:
+                # 首选地址出现非404错误时不再尝试其他地址
+                break
         
+        if outcomes and all(outcome == 404 for outcome in outcomes):
+            # 所有可能的地址都明确返回404，才认为型号不存在
+            record_negative_cache(model, 'not_found', url)
+        if response is None or (response.status_code == 404 and error is not None):
+            # 没有拿到任何响应，或除404外只有网络错误时报告网络错误
+            raise error
         response.raise_for_status()
+        return True, (response.text, url)
         
-        # 解析HTML
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # 提取规格信息
-        specs_data = []
-        hardware_section_found = False
-        last_spec_item = None  # 用于记录上一个规格项
-        
-        # 查找所有表格
-        tables = soup.find_all('table')
-        
-        # 遍历所有表格
-        for table in tables:
-            # 查找表格的前一个标题
-            prev_elem = table.find_previous(['h2', 'h3', 'h4', 'h5', 'div'])
-            if prev_elem:
-                title_text = prev_elem.get_text(strip=True)
-                # 处理规格相关的表格
-                if any(keyword in title_text.lower() for keyword in ['硬件', 'hardware', '规格', 'specifications']):
-                    hardware_section_found = True
-                    section_title = title_text
-                    last_spec_item = None  # 重置上一个规格项
-                elif hardware_section_found:
-                    # 如果已经处理完规格部分，就退出循环
-                    break
-                else:
-                    continue
-            
-            # 如果不在规格部分，跳过此表格
-            if not hardware_section_found:
-                continue
-            
-            # 处理表格内容
-            rows = table.find_all('tr')
-            for row in rows:
-                cells = row.find_all(['th', 'td'])
-                if cells:
-                    # 获取规格项（第一列）
-                    spec_name = cells[0].get_text(strip=True)
-                    
-                    # 获取规格值（第二列，如果存在）
-                    spec_value = ""
-                    if len(cells) > 1:
-                        # 检查是否有特殊标记（如勾号）
-                        check_mark = cells[1].find('img', alt='✓')
-                        if check_mark:
-                            spec_value = "✓"
-                        else:
-                            spec_value = cells[1].get_text(strip=True)
-                    
-                    # 获取备注（第三列，如果存在）
-                    spec_note = ""
-                    if len(cells) > 2:
-                        spec_note = cells[2].get_text(strip=True)
-                    
-                    # 只添加非空的规格项
-                    if spec_name or spec_value or spec_note:
-                        # 如果规格项与上一个相同，则设为空字符串
-                        if spec_name == last_spec_item:
-                            spec_name = ""
-                        elif spec_name:  # 如果是新的非空规格项
-                            last_spec_item = spec_name
-                        
-                        specs_data.append([spec_name, spec_value, spec_note])
-        
-        if not specs_data:
+    except requests.exceptions.RequestException as e:
+        return False, f"网络请求错误: {str(e)}\nURL: {url}"
+    except Exception as e:
+        return False, f"发生错误: {str(e)}\nURL: {url}"
+
+def parse_spec_page(model, html, url):
+    """从规格页面HTML中提取规格表（解析引擎见 synology_spec_parser）
+
+    返回 (True, DataFrame) 或 (False, 错误信息)。
+    成功时DataFrame的 attrs['source_url'] 记录页面地址，attrs['sections'] 记录每行所属章节。
+    """
+    try:
+        # 提取规格信息（带章节标题，供规格库使用）
+        rows = extract_spec_rows(html, with_sections=True)
+        
+        if not rows:
+            record_negative_cache(model, 'no_specs', url)
             return False, f"未找到产品 {model} 的规格信息。URL: {url}"
             
         # 将数据转换为DataFrame
-        df = pd.DataFrame(specs_data, columns=['规格项', '规格值', '技术指标'])
+        df = pd.DataFrame([row[1:] for row in rows], columns=SPEC_COLUMNS)
         
-        # 保存到Excel，设置格式
+        df.attrs['source_url'] = url
+        df.attrs['sections'] = [row[0] for row in rows]
+        return True, df
+        
+    except Exception as e:
+        return False, f"发生错误: {str(e)}\nURL: {url}"
+
+def fetch_product_specs(model):
+    """获取并解析产品规格页面（不写入Excel）
+
+    返回 (True, DataFrame) 或 (False, 错误信息)。
+    有未过期失败记录的型号直接返回失败，不发送请求。
+    本函数不访问Excel文件，可在线程池中并发调用。
+    """
+    entry = lookup_negative_cache(model)
+    if entry:
+        return False, describe_negative_entry(model, entry)
+    
+    success, result = fetch_spec_page(model)
+    if not success:
+        return False, result
+    html, url = result
+    return parse_spec_page(model, html, url)
+
+def _write_spec_sheet(writer, model, df, image_result=None, fetch_image=True):
+    """将单个产品的规格写入工作表并设置格式"""
+    # 添加一个空行作为第一行，从第二行开始写入数据
+    df.to_excel(writer, sheet_name=model, index=False, startrow=1)
+    # 获取当前工作表
+    worksheet = writer.sheets[model]
+    
+    # 合并第一行单元格并添加标题
+    worksheet.merge_cells('A1:C1')
+    worksheet['A1'] = f'群晖{model} 硬件规格'
+    
+    # 应用格式化
+    format_worksheet(worksheet, df, model, image_result=image_result, fetch_image=fetch_image)
+
+def save_specs_to_store(specs):
+    """将规格写入规格库（规格数据的主存储）
+
+    返回写入失败的 {型号: 错误信息}。
+    """
+    failures = {}
+    for model, df in specs.items():
         try:
-            # 如果文件存在且可能损坏，先尝试创建备份
-            if os.path.exists(EXCEL_FILE):
+            synology_spec_store.save_product_specs(model, df)
+        except Exception as e:
+            print(f"写入规格库失败 {model}: {str(e)}")
+            failures[model] = str(e)
+    return failures
+
+def save_specs_to_excel(specs, images=None, excel_file=None, product_times=None):
+    """将多个产品的规格一次性写入Excel文件
+
+    Args:
+        specs: dict 产品型号 -> 规格DataFrame（按写入顺序）
+        images: dict 产品型号 -> 已处理好的图片 (图片数据, 高度)，或 ImagePipeline
+                （写入每个工作表时取出对应的结果）；为None时在格式化每个工作表时下载图片
+        excel_file: 输出文件，默认为 EXCEL_FILE
+        product_times: dict 产品型号 -> 汇总表中显示的时间（默认为当前时间）
+
+    所有工作表写入、格式化和汇总表重建都在同一次打开/保存中完成。
+    """
+    if not specs:
+        return False, "没有需要保存的规格数据"
+    excel_file = excel_file or EXCEL_FILE
+    
+    try:
+        # 如果文件存在且可能损坏，先尝试创建备份
+        if os.path.exists(excel_file):
+            try:
+                # 尝试打开现有文件以验证其完整性
+                wb = load_workbook(excel_file)
+                wb.close()
+            except Exception as e:
+                # 如果文件损坏，创建备份并创建新文件
+                backup_file = f"{excel_file}.bak"
+                if os.path.exists(backup_file):
+                    os.remove(backup_file)
+                os.rename(excel_file, backup_file)
+                print(f"原文件已损坏，已创建备份：{backup_file}")
+        
+        # 创建新的Excel文件或追加到现有文件
+        if os.path.exists(excel_file):
+            writer_args = {'mode': 'a', 'if_sheet_exists': 'replace'}
+        else:
+            writer_args = {}
+        
+        # 使用with语句确保文件正确关闭
+        with pd.ExcelWriter(excel_file, engine='openpyxl', **writer_args) as writer:
+            for model, df in specs.items():
+                if images is None:
+                    _write_spec_sheet(writer, model, df)
+                else:
+                    _write_spec_sheet(writer, model, df, image_result=images.get(model), fetch_image=False)
+            
+            # 所有产品写入后统一更新汇总表
+            create_or_update_summary_sheet(writer.book, list(specs), product_times=product_times)
+                
+    except Exception as e:
+        error_msg = str(e)
+        # 如果是文件被占用的错误，给出更友好的提示
+        if "Permission denied" in error_msg or "being used by another process" in error_msg:
+            return False, f"无法保存Excel文件，请确保文件未被其他程序打开: {error_msg}"
+        return False, f"保存Excel文件时出错: {error_msg}"
+    
+    return True, f"已保存 {len(specs)} 个产品的规格信息到 {excel_file}"
+
+def get_product_specs(model, defer_images=None):
+    """获取单个产品的规格并保存到Excel
+
+    defer_images 为True时（默认取 DEFER_IMAGES）不等待图片下载，解析完规格即保存。
+    """
+    defer = DEFER_IMAGES if defer_images is None else defer_images
+    success, result = fetch_product_specs(model)
+    if not success:
+        return False, result
+    
+    store_failures = save_specs_to_store({model: result})
+    success, message = save_specs_to_excel({model: result}, images={} if defer else None)
+    if not success:
+        return False, message
+    
+    message = f"规格信息已保存到 {EXCEL_FILE} 的 {model} 工作表中"
+    if defer:
+        message += "\n产品图片稍后通过补充图片功能添加"
+    if store_failures:
+        message += f"\n写入规格库失败: {store_failures[model]}"
+    return True, message
+
+def scrape_models(models, workers=DEFAULT_WORKERS, defer_images=None):
+    """批量获取多个产品的规格
+
+    在线程池中并发获取并解析规格页面，结果收集在内存中，
+    最后一次性写入Excel（只加载和保存一次工作簿）。
+
+    Args:
+        models: 产品型号列表
+        workers: 并发线程数
+        defer_images: 为True时不下载图片（默认取 DEFER_IMAGES），之后用 attach_missing_images 补充
+
+    Returns:
+        (success, message)，message中包含失败型号的原因
+    """
+    models = _normalize_model_list(models)
+    if not models:
+        return False, "没有需要查询的产品型号"
+    
+    defer = DEFER_IMAGES if defer_images is None else defer_images
+    results = {}
+    failures = {}
+    with ImagePipeline() as images:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            future_to_model = {executor.submit(_fetch_specs_and_image, model, not defer): model
+                               for model in models}
+            for future in as_completed(future_to_model):
+                model = future_to_model[future]
                 try:
-                    # 尝试打开现有文件以验证其完整性
-                    wb = load_workbook(EXCEL_FILE)
-                    wb.close()
+                    success, result, image_content = future.result()
                 except Exception as e:
-                    # 如果文件损坏，创建备份并创建新文件
-                    backup_file = f"{EXCEL_FILE}.bak"
-                    if os.path.exists(backup_file):
-                        os.remove(backup_file)
-                    os.rename(EXCEL_FILE, backup_file)
-                    print(f"原文件已损坏，已创建备份：{backup_file}")
-            
-            # 创建新的Excel文件或追加到现有文件
-            if os.path.exists(EXCEL_FILE):
-                # 使用with语句确保文件正确关闭
-                with pd.ExcelWriter(EXCEL_FILE, mode='a', engine='openpyxl', if_sheet_exists='replace') as writer:
-                    # 添加一个空行作为第一行，从第二行开始写入数据
-                    df.to_excel(writer, sheet_name=model, index=False, startrow=1)
-                    # 获取当前工作表
-                    workbook = writer.book
-                    worksheet = writer.sheets[model]
-                    
-                    # 合并第一行单元格并添加标题
-                    worksheet.merge_cells('A1:C1')
-                    worksheet['A1'] = f'群晖{model} 硬件规格'
-                    
-                    # 应用格式化
-                    format_worksheet(worksheet, df, model)
-                    
-                    # 更新汇总表
-                    create_or_update_summary_sheet(workbook, model)
-            else:
-                # 创建新文件
-                with pd.ExcelWriter(EXCEL_FILE, engine='openpyxl') as writer:
-                    # 添加一个空行作为第一行，从第二行开始写入数据
-                    df.to_excel(writer, sheet_name=model, index=False, startrow=1)
-                    # 获取当前工作表
-                    workbook = writer.book
-                    worksheet = writer.sheets[model]
-                    
-                    # 合并第一行单元格并添加标题
-                    worksheet.merge_cells('A1:C1')
-                    worksheet['A1'] = f'群晖{model} 硬件规格'
-                    
-                    # 应用格式化
-                    format_worksheet(worksheet, df, model)
-                    
-                    # 创建汇总表
-                    create_or_update_summary_sheet(workbook, model)
-                    
+                    success, result, image_content = False, f"发生错误: {str(e)}", None
+                if success:
+                    results[model] = result
+                    # 图片交给进程池处理，不占用下载线程
+                    if image_content:
+                        images.submit(model, image_content)
+                    print(f"已获取 {model} 的规格信息（{len(result)} 行）")
+                else:
+                    failures[model] = result
+                    print(f"获取 {model} 的规格失败: {result}")
+        
+        return _save_batch_results(models, results, failures, images=images)
+
+def _fetch_specs_and_image(model, with_image=True):
+    """获取一个型号的规格和图片原始数据（在线程池中运行）"""
+    success, result = fetch_product_specs(model)
+    image_content = fetch_product_image(model) if success and with_image else None
+    return success, result, image_content
+
+def _normalize_model_list(models):
+    """去除空白和重复型号，保持原有顺序"""
+    return list(dict.fromkeys(m.strip() for m in models if m and m.strip()))
+
+def _save_batch_results(models, results, failures, images=None):
+    """按输入顺序保存批量查询结果，并汇总失败信息"""
+    specs = {model: results[model] for model in models if model in results}
+    lines = []
+    success = False
+    store_failures = {}
+    if specs:
+        store_failures = save_specs_to_store(specs)
+        success, message = save_specs_to_excel(specs, images=images)
+        lines.append(message)
+    if store_failures:
+        lines.append(f"以下 {len(store_failures)} 个型号写入规格库失败：")
+        lines.extend(f"- {model}: {store_failures[model]}" for model in models if model in store_failures)
+    if failures:
+        lines.append(f"以下 {len(failures)} 个型号获取失败：")
+        lines.extend(f"- {model}: {failures[model]}" for model in models if model in failures)
+    
+    return success, "\n".join(lines)
+
+async def _fetch_model_async(model, semaphore, session, with_images):
+    """在信号量限制下获取单个型号的规格页面和图片原始数据（不解析）"""
+    entry = lookup_negative_cache(model)
+    if entry:
+        return False, describe_negative_entry(model, entry), None
+    
+    async with semaphore:
+        success, result = await _run_requests_async(_spec_page_steps(model), session)
+        image_content = None
+        if success and with_images:
+            image_content = await _run_requests_async(_product_image_steps(model), session)
+    return success, result, image_content
+
+async def fetch_models_async(models, concurrency=ASYNC_CONCURRENCY, with_images=True, image_pipeline=None):
+    """用事件循环并发获取多个型号的规格页面和产品图片
+
+    请求由 aiohttp 发出，等待网络时不占用线程；信号量限制同时处理的型号数量。
+    页面下载完成后交给线程中的 parse_spec_page 解析，解析不占用网络并发名额；
+    指定 image_pipeline 时，每个型号的图片下载完成后立即提交处理。
+
+    Returns:
+        (results, failures)：型号->DataFrame、型号->错误信息
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    results, failures = {}, {}
+    
+    async def fetch_and_parse(model):
+        try:
+            success, result, image_content = await _fetch_model_async(model, semaphore, session, with_images)
+            if success:
+                html, url = result
+                success, result = await loop.run_in_executor(parser, parse_spec_page, model, html, url)
         except Exception as e:
-            error_msg = str(e)
-            # 如果是文件被占用的错误，给出更友好的提示
-            if "Permission denied" in error_msg or "being used by another process" in error_msg:
-                return False, f"无法保存Excel文件，请确保文件未被其他程序打开: {error_msg}"
-            return False, f"保存Excel文件时出错: {error_msg}"
+            success, result, image_content = False, f"发生错误: {str(e)}", None
         
-        return True, f"规格信息已保存到 {EXCEL_FILE} 的 {model} 工作表中"
+        if success:
+            results[model] = result
+            if image_pipeline is not None and image_content:
+                image_pipeline.submit(model, image_content)
+            print(f"已获取 {model} 的规格信息（{len(result)} 行）")
+        else:
+            failures[model] = result
+            print(f"获取 {model} 的规格失败: {result}")
+    
+    with ThreadPoolExecutor(max_workers=PARSE_WORKERS) as parser:
+        async with synology_http.create_async_session(max(1, concurrency)) as session:
+            await asyncio.gather(*(fetch_and_parse(model) for model in models))
+    
+    return results, failures
+
+def scrape_models_async(models, concurrency=ASYNC_CONCURRENCY, defer_images=None):
+    """用异步流水线批量获取规格（适合整个产品目录的刷新）
+
+    与 scrape_models 相同，结果最后一次性写入Excel。没有安装 aiohttp 时改用 scrape_models。
+    """
+    if not synology_http.HAS_AIOHTTP:
+        print("未安装aiohttp，改用线程池批量查询")
+        return scrape_models(models, workers=min(concurrency, POOL_SIZE), defer_images=defer_images)
+    
+    models = _normalize_model_list(models)
+    if not models:
+        return False, "没有需要查询的产品型号"
+    
+    defer = DEFER_IMAGES if defer_images is None else defer_images
+    # 图片在下载完成后立即交给进程池处理，写入工作表时按型号取出结果
+    with ImagePipeline() as images:
+        results, failures = asyncio.run(fetch_models_async(models, concurrency, with_images=not defer,
+                                                           image_pipeline=images))
+        return _save_batch_results(models, results, failures, images=images)
+
+def _sheets_missing_images(workbook, models=None):
+    """返回没有产品图片的规格表型号（按工作表顺序）"""
+    wanted = set(models) if models is not None else None
+    return [ws.title for ws in workbook.worksheets
+            if validate_model_number(ws.title)[0] and not ws._images
+            and (wanted is None or ws.title in wanted)]
+
+def attach_missing_images(excel_file=None, models=None, workers=DEFAULT_WORKERS):
+    """为没有产品图片的规格表补充图片
+
+    并发下载所有缺少图片的型号，图片交给 ImagePipeline 处理，
+    全部插入后只保存一次工作簿。适合在先保存规格（DEFER_IMAGES）之后批量执行。
+
+    Args:
+        excel_file: Excel文件，默认为 EXCEL_FILE
+        models: 只处理这些型号，默认为全部缺少图片的规格表
+        workers: 并发下载线程数
+    """
+    excel_file = excel_file or EXCEL_FILE
+    if not os.path.exists(excel_file):
+        return False, f"找不到Excel文件：{excel_file}"
+    
+    try:
+        workbook = load_workbook(excel_file)
+        missing = _sheets_missing_images(workbook, models)
+        if not missing:
+            return True, "所有规格表都已有产品图片"
+        print(f"需要补充图片的规格表: {len(missing)} 个")
         
-    except requests.exceptions.RequestException as e:
-        return False, f"网络请求错误: {str(e)}\nURL: {url}"
+        attached = []
+        failed = []
+        with ImagePipeline() as images:
+            with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+                future_to_model = {executor.submit(fetch_product_image, model): model for model in missing}
+                for future in as_completed(future_to_model):
+                    model = future_to_model[future]
+                    try:
+                        content = future.result()
+                    except Exception as e:
+                        print(f"下载 {model} 的图片时出错: {str(e)}")
+                        content = None
+                    if content:
+                        images.submit(model, content)
+            
+            for model in missing:
+                img_result = images.get(model)
+                if img_result and insert_product_image(workbook[model], img_result):
+                    attached.append(model)
+                else:
+                    failed.append(model)
+        
+        if attached:
+            workbook.save(excel_file)
     except Exception as e:
-        return False, f"发生错误: {str(e)}\nURL: {url}"
+        error_msg = str(e)
+        if "Permission denied" in error_msg or "being used by another process" in error_msg:
+            return False, f"无法保存Excel文件，请确保文件未被其他程序打开: {error_msg}"
+        return False, f"补充图片时出错: {error_msg}"
+    
+    lines = [f"已为 {len(attached)} 个规格表补充产品图片"]
+    if failed:
+        lines.append(f"以下 {len(failed)} 个型号的图片获取失败：")
+        lines.extend(f"- {model}" for model in failed)
+    return bool(attached), "\n".join(lines)
 
-def check_model_exists(model):
-    """检查产品型号是否已存在于Excel文件中"""
+def export_store_to_excel(excel_file=None, models=None):
+    """由规格库生成Excel汇总文件
+
+    产品图片只使用本地保存的图片（缩略图缓存或原图），不下载；没有本地图片的型号写入占位提示。
+
+    Args:
+        excel_file: 输出文件，默认为 EXCEL_FILE（已存在时更新其中的产品工作表）
+        models: 要导出的型号列表，默认为规格库中的全部产品
+    """
+    products = synology_spec_store.list_products()
+    if models is not None:
+        wanted = set(models)
+        products = [product for product in products if product[0] in wanted]
+    if not products:
+        return False, "规格库中没有可导出的产品"
+    
+    specs = {}
+    product_times = {}
+    for model, scraped_at, _ in products:
+        df = synology_spec_store.load_product_specs(model)
+        if df is not None:
+            specs[model] = df
+            # 汇总表时间精确到分钟
+            product_times[model] = scraped_at[:16]
+    
+    options = thumbnail_options()
+    images = {}
+    for model in specs:
+        img_result = load_local_product_image(model, options)
+        if img_result is not None:
+            images[model] = img_result
+    
+    return save_specs_to_excel(specs, images=images, excel_file=excel_file, product_times=product_times)
+
+def list_catalogue_models():
+    """列出Excel文件中已有的全部产品型号"""
     if not os.path.exists(EXCEL_FILE):
-        return False
-    try:
-        wb = load_workbook(EXCEL_FILE)
-        return model in wb.sheetnames
-    except Exception:
-        return False
+        return []
+    return [name for name in get_sheet_names(EXCEL_FILE) if validate_model_number(name)[0]]
+
+def check_model_exists(model):
+    """检查产品型号是否已存在于Excel文件中（只读取工作表目录）"""
+    return has_sheet(EXCEL_FILE, model)
 
 class ProductSpecsApp:
     def __init__(self):
         self.root = tk.Tk()
         self.root.title(f"群晖产品规格查询 V{__version__}")
-        self.root.geometry("400x400")  # 增加窗口高度
+        self.root.geometry("400x340")
         self.setup_ui()
         self.center_window()
         
-        # 初始化排序状态
-        self.sort_state = {'by': None, 'ascending': True}
-        
-        # 监听Excel文件变化
-        self.watch_excel_file()
-        
-    def watch_excel_file(self):
-        """监听Excel文件的变化，检查是否有排序请求"""
-        if os.path.exists(EXCEL_FILE):
-            try:
-                workbook = load_workbook(EXCEL_FILE)
-                if SUMMARY_SHEET in workbook.sheetnames:
-                    sheet = workbook[SUMMARY_SHEET]
-                    
-                    # 检查B1和C1单元格的超链接
-                    for cell in [sheet['B1'], sheet['C1']]:
-                        if cell.hyperlink and cell.hyperlink.target:
-                            if cell.hyperlink.target == "sort_name":
-                                self.on_sort('name', True)
-                                break
-                            elif cell.hyperlink.target == "sort_time":
-                                self.on_sort('time', True)
-                                break
-                workbook.close()
-            except Exception:
-                pass
-        
-        # 每500毫秒检查一次
-        self.root.after(500, self.watch_excel_file)
-    
     def focus_window(self):
         """激活窗口并设置输入框焦点"""
         self.root.lift()  # 将窗口提升到最前
@@ -805,15 +1736,24 @@ class ProductSpecsApp:
         submit_btn = tk.Button(self.root, text="获取规格", command=self.on_submit)
         submit_btn.pack(pady=10)
         
-        # 添加更新汇总表按钮
-        update_summary_btn = tk.Button(self.root, text="更新汇总表", command=self.on_update_summary)
-        update_summary_btn.pack(pady=5)
+        # 添加更新汇总表和补充图片按钮
+        button_frame = tk.Frame(self.root)
+        button_frame.pack(pady=5)
+        update_summary_btn = tk.Button(button_frame, text="更新汇总表", command=self.on_update_summary)
+        update_summary_btn.pack(side=tk.LEFT, padx=5)
+        attach_images_btn = tk.Button(button_frame, text="补充图片", command=self.on_attach_images)
+        attach_images_btn.pack(side=tk.LEFT, padx=5)
         
         # 添加继续查询复选框
         self.continue_var = tk.BooleanVar(value=True)
         continue_cb = tk.Checkbutton(self.root, text="继续查询下一个产品", variable=self.continue_var)
         continue_cb.pack(pady=5)
         
+        # 添加暂不下载图片复选框
+        self.defer_images_var = tk.BooleanVar(value=DEFER_IMAGES)
+        defer_images_cb = tk.Checkbutton(self.root, text="先保存规格，稍后补充图片", variable=self.defer_images_var)
+        defer_images_cb.pack(pady=5)
+        
         # 添加已查询产品数量标签
         self.count_label = tk.Label(self.root, text="已查询产品数量: 0")
         self.count_label.pack(pady=5)
@@ -825,28 +1765,6 @@ class ProductSpecsApp:
         # 初始化计数器
         self.query_count = 0
         
-        # 添加排序区域标题
-        sort_title = tk.Label(self.root, text="排序选项", font=("", 10, "bold"))
-        sort_title.pack(pady=(10, 5))
-        
-        # 添加排序按钮框架
-        sort_frame = tk.Frame(self.root)
-        sort_frame.pack(pady=5)
-        
-        # 创建产品型号排序按钮
-        model_frame = tk.LabelFrame(sort_frame, text="按产品型号", padx=5, pady=5)
-        model_frame.pack(side=tk.LEFT, padx=10)
-        
-        tk.Button(model_frame, text="▲ 升序", command=lambda: self.on_sort('name', True)).pack(side=tk.LEFT, padx=2)
-        tk.Button(model_frame, text="▼ 降序", command=lambda: self.on_sort('name', False)).pack(side=tk.LEFT, padx=2)
-        
-        # 创建更新时间排序按钮
-        time_frame = tk.LabelFrame(sort_frame, text="按更新时间", padx=5, pady=5)
-        time_frame.pack(side=tk.LEFT, padx=10)
-        
-        tk.Button(time_frame, text="▲ 升序", command=lambda: self.on_sort('time', True)).pack(side=tk.LEFT, padx=2)
-        tk.Button(time_frame, text="▼ 降序", command=lambda: self.on_sort('time', False)).pack(side=tk.LEFT, padx=2)
-        
         # 初始化时激活窗口
         self.root.after(100, self.focus_window)
         
@@ -865,6 +1783,18 @@ class ProductSpecsApp:
             self.root.after(100, self.focus_window)  # 确保窗口激活
             return
             
+        # 检查是否有未过期的失败记录
+        entry = lookup_negative_cache(model)
+        if entry:
+            response = messagebox.askyesno("提示",
+                f"{describe_negative_entry(model, entry)}\n\n是否忽略该记录重新查询？")
+            if not response:
+                self.entry.select_range(0, tk.END)
+                self.status_label.config(text="操作已取消", fg="blue")
+                self.root.after(100, self.focus_window)
+                return
+            purge_negative_cache([model])
+        
         # 检查产品型号是否已存在
         if check_model_exists(model):
             response = messagebox.askyesno("提示", 
@@ -880,7 +1810,7 @@ class ProductSpecsApp:
         self.status_label.config(text="正在查询...", fg="blue")
         self.root.update()
         
-        success, message = get_product_specs(model)
+        success, message = get_product_specs(model, defer_images=self.defer_images_var.get())
         if success:
             self.query_count += 1
             self.count_label.config(text=f"已查询产品数量: {self.query_count}")
@@ -912,35 +1842,100 @@ class ProductSpecsApp:
             messagebox.showerror("错误", message)
         self.root.after(100, self.focus_window)
     
-    def on_sort(self, sort_by, ascending):
-        """排序按钮点击事件处理"""
-        if os.path.exists(EXCEL_FILE):
-            try:
-                # 应用排序
-                workbook = load_workbook(EXCEL_FILE)
-                create_or_update_summary_sheet(
-                    workbook,
-                    sort_by=sort_by,
-                    sort_ascending=ascending
-                )
-                workbook.save(EXCEL_FILE)
-                
-                self.status_label.config(
-                    text=f"已按{'产品型号' if sort_by == 'name' else '添加时间'}{'升序' if ascending else '降序'}排序",
-                    fg="green"
-                )
-            except Exception as e:
-                self.status_label.config(text=f"排序失败: {str(e)}", fg="red")
-                messagebox.showerror("错误", f"排序失败: {str(e)}")
+    def on_attach_images(self):
+        """补充图片按钮的点击事件处理"""
+        self.status_label.config(text="正在补充图片...", fg="blue")
+        self.root.update()
+        success, message = attach_missing_images()
+        if success:
+            self.status_label.config(text="图片补充完成", fg="green")
+            messagebox.showinfo("结果", message)
         else:
-            self.status_label.config(text="Excel文件不存在", fg="red")
-            messagebox.showerror("错误", "Excel文件不存在")
-        
+            self.status_label.config(text="图片补充失败", fg="red")
+            messagebox.showerror("错误", message)
         self.root.after(100, self.focus_window)
     
     def run(self):
         self.root.mainloop()
 
+def read_models_file(path):
+    """读取型号列表文件（每行一个型号，#开头为注释）"""
+    with open(path, encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.strip().startswith('#')]
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=f"群晖产品规格查询 V{__version__}")
+    parser.add_argument('models', nargs='*', help='要批量查询的产品型号，不指定时启动图形界面')
+    parser.add_argument('-f', '--file', help='型号列表文件（每行一个型号）')
+    parser.add_argument('-w', '--workers', type=int, default=None,
+                        help=f'并发数（默认线程池 {DEFAULT_WORKERS}，异步模式 {ASYNC_CONCURRENCY}）')
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help='使用异步流水线（适合大批量刷新，需要安装aiohttp）')
+    parser.add_argument('--refresh-all', action='store_true',
+                        help='重新获取Excel文件中已有的全部产品')
+    parser.add_argument('--max-age', type=int, default=None,
+                        help='HTTP缓存有效期（秒），有效期内不再向服务器确认')
+    parser.add_argument('--purge-negative', action='store_true',
+                        help='清除指定型号（未指定时清除全部）的失败记录后退出')
+    parser.add_argument('--export', action='store_true',
+                        help='由规格库导出指定型号（未指定时导出全部）到Excel文件后退出')
+    parser.add_argument('--export-file', default=EXCEL_FILE, metavar='XLSX',
+                        help=f'--export 的输出文件（默认 {EXCEL_FILE}）')
+    parser.add_argument('--transparent', nargs='?', type=int, const=TRANSPARENT_TOLERANCE_DEFAULT,
+                        metavar='TOLERANCE',
+                        help=f'嵌入图片时把白色背景转为透明（容差默认 {TRANSPARENT_TOLERANCE_DEFAULT}，即RGB都大于240）')
+    parser.add_argument('--thumbnail-format', choices=THUMBNAIL_FORMATS,
+                        help=f'嵌入工作表的图片格式（默认 {THUMBNAIL_FORMAT}）')
+    parser.add_argument('--jpeg-quality', type=int, metavar='QUALITY',
+                        help=f'JPEG图片的质量（默认 {THUMBNAIL_JPEG_QUALITY}）')
+    parser.add_argument('--defer-images', action='store_true',
+                        help='先保存规格，不下载产品图片（之后用 --attach-images 补充）')
+    parser.add_argument('--attach-images', action='store_true',
+                        help='为缺少图片的规格表（或指定型号）补充产品图片后退出')
+    args = parser.parse_args()
+    
+    # 先应用缓存和图片设置，导出等提前退出的操作也使用这些设置
+    if args.max_age is not None:
+        synology_http.HTTP_CACHE_MAX_AGE = args.max_age
+    if args.transparent is not None:
+        TRANSPARENT_TOLERANCE = args.transparent
+    if args.thumbnail_format:
+        THUMBNAIL_FORMAT = args.thumbnail_format
+    if args.jpeg_quality is not None:
+        THUMBNAIL_JPEG_QUALITY = args.jpeg_quality
+    if args.defer_images:
+        DEFER_IMAGES = True
+    
+    if args.export:
+        success, message = export_store_to_excel(args.export_file, args.models or None)
+        print(message)
+        raise SystemExit(0 if success else 1)
+    
+    if args.purge_negative:
+        removed = purge_negative_cache(args.models or None)
+        print(f"已清除 {removed} 条失败记录")
+        raise SystemExit(0)
+    
+    if args.attach_images:
+        success, message = attach_missing_images(models=args.models or None,
+                                                 workers=args.workers or DEFAULT_WORKERS)
+        print(message)
+        raise SystemExit(0 if success else 1)
+    
+    models = list(args.models)
+    if args.file:
+        models.extend(read_models_file(args.file))
+    if args.refresh_all:
+        models.extend(list_catalogue_models())
+    
+    if models:
+        # 命令行批量查询
+        if args.use_async:
+            success, message = scrape_models_async(models, concurrency=args.workers or ASYNC_CONCURRENCY)
+        else:
+            success, message = scrape_models(models, workers=args.workers or DEFAULT_WORKERS)
+        print(message)
+        raise SystemExit(0 if success else 1)
+    
     app = ProductSpecsApp()
     app.run() 
\ No newline at end of file
@@ -0,0 +1,82 @@
+"""文字显示宽度和换行行数估算
+
+Excel的列宽以默认字体中一个数字的宽度为单位。这里按Unicode东亚宽度分类估算文字宽度：
+全角/宽字符（中文、日文、全角符号等，W/F类）占2个单位，组合字符和控制字符不占宽度，
+其他字符占1个单位。
+
+换行行数按Excel自动换行的方式估算：英文单词整体换行，过长的单词和中文按字符换行，
+手动换行符另起一行。规格值在不同产品之间大量重复，结果按 (文字, 列宽) 缓存。
+"""
+import re
+import unicodedata
+from functools import lru_cache
+
+# 缓存的 (文字, 列宽) 组合数量
+LINE_COUNT_CACHE_SIZE = 8192
+
+# 单词（连续的窄字符）、单个宽字符或空白
+_TOKEN_PATTERN = re.compile(r'\s+|\S')
+
+@lru_cache(maxsize=65536)
+def char_width(ch):
+    """单个字符的显示宽度（0、1或2）"""
+    if unicodedata.combining(ch) or unicodedata.category(ch) in ('Cc', 'Cf'):
+        return 0
+    if unicodedata.east_asian_width(ch) in ('W', 'F'):
+        return 2
+    return 1
+
+def text_width(text):
+    """文字的显示宽度（不含换行）"""
+    return sum(char_width(ch) for ch in text)
+
+def _tokens(line):
+    """把一行拆成换行单位：连续窄字符组成的单词、单个宽字符、空白"""
+    word = []
+    for match in _TOKEN_PATTERN.finditer(line):
+        token = match.group(0)
+        if token.isspace() or char_width(token) == 2:
+            if word:
+                yield ''.join(word)
+                word = []
+            yield token
+        else:
+            word.append(token)
+    if word:
+        yield ''.join(word)
+
+def _wrap_line_count(line, width):
+    """单行文字（不含换行符）在指定宽度下自动换行后的行数"""
+    lines = 1
+    used = 0
+    for token in _tokens(line):
+        token_width = text_width(token)
+        if used + token_width <= width:
+            used += token_width
+            continue
+        if token.isspace():
+            # 行尾的空白不会换到下一行
+            used = width
+            continue
+        if token_width <= width:
+            lines += 1
+            used = token_width
+            continue
+        # 比整行还宽的单词按字符换行
+        for ch in token:
+            w = char_width(ch)
+            if used + w > width and used > 0:
+                lines += 1
+                used = 0
+            used += w
+    return lines
+
+@lru_cache(maxsize=LINE_COUNT_CACHE_SIZE)
+def wrapped_line_count(text, column_width):
+    """文字在指定列宽（Excel列宽单位）的单元格中自动换行后的行数，至少为1"""
+    width = max(int(column_width or 0), 1)
+    return sum(_wrap_line_count(line, width) for line in str(text).split('\n'))
+
+def explicit_line_count(text):
+    """不自动换行时的行数（只计算手动换行符）"""
+    return str(text).count('\n') + 1
@@ -0,0 +1,522 @@
+"""xlsx文件的轻量读取工具
+
+xlsx文件是zip压缩包，工作表列表保存在 xl/workbook.xml 中。
+只需要工作表名称或某个工作表的少量信息时，直接读取相关的几个文件，
+无需用openpyxl加载整个工作簿。
+
+iter_sheets() 在同一个压缩包中依次读取多个工作表，共享字符串只读取一次。
+
+修改单个工作表时，read_sheet() 流式读取该工作表的单元格和超链接，
+patch_sheet() 只重新生成该工作表的单元格数据、超链接及其关系文件（以及表格范围），
+其他压缩包成员的内容原样复制到新文件中，不需要加载或重新序列化其他工作表。
+"""
+import os
+import posixpath
+import re
+import struct
+import threading
+import zipfile
+import xml.etree.ElementTree as ET
+from collections import namedtuple
+from xml.sax.saxutils import escape, quoteattr
+
+from openpyxl.utils import get_column_letter
+from openpyxl.utils.cell import coordinate_from_string, column_index_from_string
+
+from synology_files import atomic_open
+
+# 电子表格主命名空间
+MAIN_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+# 关系命名空间
+REL_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+PKG_REL_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+HYPERLINK_REL_TYPE = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/hyperlink'
+TABLE_REL_TYPE = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/table'
+
+# 单元格的值和样式索引（styles.xml 中 cellXfs 的序号）
+SheetCell = namedtuple('SheetCell', 'value style')
+# 工作表超链接；target 为外部目标（写入关系文件），location 为工作簿内位置
+SheetHyperlink = namedtuple('SheetHyperlink', 'ref target location display tooltip')
+
+# 通用标志位中的数据描述符标记（CRC和大小写在数据之后而不是本地文件头中）
+_FLAG_DATA_DESCRIPTOR = 0x08
+
+# hyperlinks 元素之后可能出现的元素（新增超链接时插入到第一个之前）
+_AFTER_HYPERLINKS = ('printOptions', 'pageMargins', 'pageSetup', 'headerFooter', 'rowBreaks', 'colBreaks',
+                     'customProperties', 'cellWatches', 'ignoredErrors', 'smartTags', 'drawing',
+                     'legacyDrawing', 'legacyDrawingHF', 'picture', 'oleObjects', 'controls',
+                     'webPublishItems', 'tableParts', 'extLst')
+
+_sheet_names_cache = {}  # 文件绝对路径 -> ((mtime, size), 工作表名称)
+_cache_lock = threading.Lock()
+
+def file_signature(path):
+    """返回文件的 (修改时间, 大小)，用于判断文件是否变化"""
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+def read_sheet_names(path):
+    """从 xl/workbook.xml 读取工作表名称（按工作簿中的顺序）"""
+    names = []
+    with zipfile.ZipFile(path) as archive:
+        with archive.open('xl/workbook.xml') as f:
+            for _, element in ET.iterparse(f):
+                if element.tag == f'{{{MAIN_NS}}}sheet':
+                    names.append(element.get('name'))
+                elif element.tag == f'{{{MAIN_NS}}}sheets':
+                    # 工作表列表之后的内容无需解析
+                    break
+    return names
+
+def get_sheet_names(path):
+    """获取工作表名称列表，按文件的修改时间和大小缓存
+
+    文件未变化时直接返回缓存结果；文件不存在时抛出 FileNotFoundError。
+    """
+    key = os.path.abspath(path)
+    signature = file_signature(path)
+    with _cache_lock:
+        cached = _sheet_names_cache.get(key)
+    if cached and cached[0] == signature:
+        return list(cached[1])
+
+    names = read_sheet_names(path)
+    with _cache_lock:
+        _sheet_names_cache[key] = (signature, tuple(names))
+    return names
+
+def has_sheet(path, sheet_name):
+    """判断工作簿中是否有指定名称的工作表（文件不存在或无法读取时返回False）"""
+    try:
+        return sheet_name in get_sheet_names(path)
+    except (OSError, KeyError, zipfile.BadZipFile, ET.ParseError):
+        return False
+
+def _read_relationships_full(archive, rels_path):
+    """读取关系文件，返回 {关系ID: (类型, 目标, 目标模式)}"""
+    try:
+        f = archive.open(rels_path)
+    except KeyError:
+        return {}
+    relationships = {}
+    with f:
+        for _, element in ET.iterparse(f):
+            if element.tag == f'{{{PKG_REL_NS}}}Relationship':
+                relationships[element.get('Id')] = (element.get('Type'), element.get('Target'),
+                                                    element.get('TargetMode'))
+    return relationships
+
+def _read_relationships(archive, rels_path):
+    """读取关系文件，返回 {关系ID: (目标, 目标模式)}"""
+    return {rel_id: (target, mode)
+            for rel_id, (_, target, mode) in _read_relationships_full(archive, rels_path).items()}
+
+def _resolve_target(base_part, target):
+    """把关系中的相对目标转换为压缩包内的路径"""
+    if target.startswith('/'):
+        return target[1:]
+    return posixpath.normpath(posixpath.join(posixpath.dirname(base_part), target))
+
+def _rels_path(part):
+    """返回部件对应的关系文件路径，如 xl/worksheets/_rels/sheet1.xml.rels"""
+    directory, name = posixpath.split(part)
+    return posixpath.join(directory, '_rels', name + '.rels')
+
+def find_sheet_part(archive, sheet_name):
+    """返回工作表在压缩包中的路径（如 xl/worksheets/sheet1.xml），不存在时返回None"""
+    rel_id = None
+    with archive.open('xl/workbook.xml') as f:
+        for _, element in ET.iterparse(f):
+            if element.tag == f'{{{MAIN_NS}}}sheet' and element.get('name') == sheet_name:
+                rel_id = element.get(f'{{{REL_NS}}}id')
+                break
+    if rel_id is None:
+        return None
+    relationships = _read_relationships(archive, 'xl/_rels/workbook.xml.rels')
+    if rel_id not in relationships:
+        return None
+    return _resolve_target('xl/workbook.xml', relationships[rel_id][0])
+
+def _sheet_parts(archive):
+    """返回 {工作表名称: 工作表在压缩包中的路径}"""
+    rel_ids = {}
+    with archive.open('xl/workbook.xml') as f:
+        for _, element in ET.iterparse(f):
+            if element.tag == f'{{{MAIN_NS}}}sheet':
+                rel_ids[element.get('name')] = element.get(f'{{{REL_NS}}}id')
+    relationships = _read_relationships(archive, 'xl/_rels/workbook.xml.rels')
+    return {name: _resolve_target('xl/workbook.xml', relationships[rel_id][0])
+            for name, rel_id in rel_ids.items() if rel_id in relationships}
+
+def _read_shared_strings(archive, indices):
+    """从 xl/sharedStrings.xml 流式读取指定序号的共享字符串，不保留其他字符串"""
+    strings = {}
+    if not indices:
+        return strings
+    try:
+        f = archive.open('xl/sharedStrings.xml')
+    except KeyError:
+        return strings
+    remaining = set(indices)
+    index = 0
+    with f:
+        for _, element in ET.iterparse(f):
+            if element.tag == f'{{{MAIN_NS}}}si':
+                if index in remaining:
+                    strings[index] = _string_item_text(element)
+                    remaining.discard(index)
+                    if not remaining:
+                        break
+                index += 1
+                element.clear()
+    return strings
+
+def _read_all_shared_strings(archive):
+    """读取 xl/sharedStrings.xml 中的全部共享字符串（按序号排列的列表）"""
+    strings = []
+    try:
+        f = archive.open('xl/sharedStrings.xml')
+    except KeyError:
+        return strings
+    with f:
+        for _, element in ET.iterparse(f):
+            if element.tag == f'{{{MAIN_NS}}}si':
+                strings.append(_string_item_text(element))
+                element.clear()
+    return strings
+
+def _string_item_text(element):
+    """<si>或<is>元素的文字：直接的<t>，或富文本各<r>中的<t>（不含注音<rPh>）"""
+    parts = []
+    for child in element:
+        if child.tag == f'{{{MAIN_NS}}}t':
+            parts.append(child.text or '')
+        elif child.tag == f'{{{MAIN_NS}}}r':
+            t = child.find(f'{{{MAIN_NS}}}t')
+            if t is not None:
+                parts.append(t.text or '')
+    return ''.join(parts)
+
+def _cell_value(element, cell_type):
+    """解析<c>元素的值；共享字符串返回 ('s', 序号)，由调用方统一查找"""
+    if cell_type == 'inlineStr':
+        is_element = element.find(f'{{{MAIN_NS}}}is')
+        return None if is_element is None else _string_item_text(is_element)
+
+    v = element.find(f'{{{MAIN_NS}}}v')
+    if v is None or v.text is None:
+        return None
+    text = v.text
+    if cell_type == 's':
+        return ('s', int(text))
+    if cell_type == 'b':
+        return text == '1'
+    if cell_type in ('str', 'e', 'd'):
+        return text
+    try:
+        return int(text)
+    except ValueError:
+        pass
+    try:
+        return float(text)
+    except ValueError:
+        return text
+
+def _parse_sheet(archive, sheet_part):
+    """流式解析工作表XML，返回 (cells, shared, links)
+
+    共享字符串的单元格值暂为 ('s', 序号)，shared 记录 {(行, 列): 序号}，由调用方统一查找；
+    links 为 (ref, 关系ID, location, display, tooltip) 列表。
+    """
+    cells = {}
+    links = []
+    shared = {}  # (行, 列) -> 共享字符串序号
+    with archive.open(sheet_part) as f:
+        row_index = 0
+        col_index = 0
+        for event, element in ET.iterparse(f, events=('start', 'end')):
+            tag = element.tag
+            if event == 'start':
+                if tag == f'{{{MAIN_NS}}}row':
+                    row_index = int(element.get('r') or row_index + 1)
+                    col_index = 0
+                continue
+
+            if tag == f'{{{MAIN_NS}}}c':
+                ref = element.get('r')
+                if ref:
+                    column, row_index = coordinate_from_string(ref)
+                    col_index = column_index_from_string(column)
+                else:
+                    col_index += 1
+                value = _cell_value(element, element.get('t'))
+                if isinstance(value, tuple):
+                    shared[(row_index, col_index)] = value[1]
+                cells[(row_index, col_index)] = SheetCell(value, int(element.get('s') or 0))
+                element.clear()
+            elif tag == f'{{{MAIN_NS}}}hyperlink':
+                links.append((element.get('ref'), element.get(f'{{{REL_NS}}}id'), element.get('location'),
+                              element.get('display'), element.get('tooltip')))
+    return cells, shared, links
+
+def read_sheet(path, sheet_name):
+    """流式读取一个工作表的单元格和超链接
+
+    Returns:
+        (cells, hyperlinks)：cells 为 {(行, 列): SheetCell}，hyperlinks 为 SheetHyperlink 列表；
+        工作表不存在时返回None
+    """
+    with zipfile.ZipFile(path) as archive:
+        sheet_part = find_sheet_part(archive, sheet_name)
+        if sheet_part is None:
+            return None
+
+        cells, shared, links = _parse_sheet(archive, sheet_part)
+        strings = _read_shared_strings(archive, set(shared.values()))
+        for key, index in shared.items():
+            cells[key] = cells[key]._replace(value=strings.get(index, ''))
+
+        relationships = _read_relationships(archive, _rels_path(sheet_part)) if any(l[1] for l in links) else {}
+        hyperlinks = [SheetHyperlink(ref, relationships.get(rel_id, (None,))[0] if rel_id else None,
+                                     location, display, tooltip)
+                      for ref, rel_id, location, display, tooltip in links]
+    return cells, hyperlinks
+
+def iter_sheets(path, sheet_names):
+    """依次流式读取多个工作表的单元格
+
+    压缩包只打开一次，工作表列表和共享字符串也只读取一次（共享字符串在第一个用到它的工作表时读取）。
+    逐个生成 (工作表名称, cells)，cells 为 {(行, 列): SheetCell}；工作表不存在时为None。
+    """
+    with zipfile.ZipFile(path) as archive:
+        parts = _sheet_parts(archive)
+        strings = None
+        for sheet_name in sheet_names:
+            sheet_part = parts.get(sheet_name)
+            if sheet_part is None:
+                yield sheet_name, None
+                continue
+            cells, shared, _ = _parse_sheet(archive, sheet_part)
+            if shared:
+                if strings is None:
+                    strings = _read_all_shared_strings(archive)
+                for key, index in shared.items():
+                    value = strings[index] if index < len(strings) else ''
+                    cells[key] = cells[key]._replace(value=value)
+            yield sheet_name, cells
+
+def _cell_xml(coordinate, cell):
+    """生成<c>元素；字符串使用内联字符串，不修改共享字符串表"""
+    style = f' s="{cell.style}"' if cell.style else ''
+    value = cell.value
+    if value is None:
+        return f'<c r="{coordinate}"{style}/>'
+    if isinstance(value, bool):
+        return f'<c r="{coordinate}"{style} t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        return f'<c r="{coordinate}"{style}><v>{value!r}</v></c>'
+    text = str(value)
+    space = ' xml:space="preserve"' if text != text.strip() else ''
+    return f'<c r="{coordinate}"{style} t="inlineStr"><is><t{space}>{escape(text)}</t></is></c>'
+
+def _sheet_data_xml(cells):
+    """按行生成<sheetData>"""
+    rows = {}
+    for (row, col), cell in cells.items():
+        rows.setdefault(row, []).append((col, cell))
+    parts = ['<sheetData>']
+    for row in sorted(rows):
+        parts.append(f'<row r="{row}">')
+        for col, cell in sorted(rows[row], key=lambda item: item[0]):
+            parts.append(_cell_xml(f'{get_column_letter(col)}{row}', cell))
+        parts.append('</row>')
+    parts.append('</sheetData>')
+    return ''.join(parts)
+
+def _replace_element(xml, tag, new_xml, before=()):
+    """替换工作表XML中的一个顶层元素；不存在时插入到 before 中第一个出现的元素之前
+
+    new_xml 为空字符串时删除该元素。找不到插入位置时返回None。
+    """
+    pattern = re.compile(rf'<{tag}\b[^>]*?/>|<{tag}\b[^>]*>.*?</{tag}>', re.S)
+    if pattern.search(xml):
+        return pattern.sub(lambda m: new_xml, xml, count=1)
+    if not new_xml:
+        return xml
+    for name in before:
+        match = re.search(rf'<{name}\b', xml)
+        if match:
+            return xml[:match.start()] + new_xml + xml[match.start():]
+    end = xml.rfind('</worksheet>')
+    if end < 0:
+        return None
+    return xml[:end] + new_xml + xml[end:]
+
+def _copy_member(source, info, output):
+    """把压缩包成员的压缩数据原样复制到新压缩包，不解压也不重新压缩
+
+    source 为源压缩包以二进制方式打开的文件；压缩方式、CRC和大小沿用原记录，
+    本地文件头按原记录重新生成（去掉数据描述符标记，大小直接写在文件头中）。
+    """
+    source.seek(info.header_offset)
+    header = source.read(zipfile.sizeFileHeader)
+    if len(header) != zipfile.sizeFileHeader or header[:4] != zipfile.stringFileHeader:
+        raise zipfile.BadZipFile(f"压缩包成员的文件头损坏: {info.filename}")
+    name_length, extra_length = struct.unpack('<HH', header[26:30])
+    source.seek(info.header_offset + zipfile.sizeFileHeader + name_length + extra_length)
+
+    new_info = zipfile.ZipInfo(info.filename, date_time=info.date_time)
+    new_info.compress_type = info.compress_type
+    new_info.flag_bits = info.flag_bits & ~_FLAG_DATA_DESCRIPTOR
+    new_info.create_system = info.create_system
+    new_info.external_attr = info.external_attr
+    new_info.CRC = info.CRC
+    new_info.compress_size = info.compress_size
+    new_info.file_size = info.file_size
+    new_info.header_offset = output.fp.tell()
+
+    output.fp.write(new_info.FileHeader())
+    remaining = info.compress_size
+    while remaining > 0:
+        chunk = source.read(min(remaining, 1024 * 1024))
+        if not chunk:
+            raise zipfile.BadZipFile(f"压缩包成员的数据不完整: {info.filename}")
+        output.fp.write(chunk)
+        remaining -= len(chunk)
+
+    output.filelist.append(new_info)
+    output.NameToInfo[new_info.filename] = new_info
+    output.start_dir = output.fp.tell()
+
+def _table_start_tag(table_xml):
+    match = re.search(r'<table\b[^>]*>', table_xml)
+    return match.group(0) if match else ''
+
+def _table_attr(table_xml, name):
+    match = re.search(rf'\b{name}="([^"]*)"', _table_start_tag(table_xml))
+    return match.group(1) if match else None
+
+def _set_table_ref(table_xml, ref):
+    """修改表格及其自动筛选的范围，并去掉已保存的排序状态（行已重新生成）"""
+    start_tag = _table_start_tag(table_xml)
+    table_xml = table_xml.replace(start_tag, re.sub(r'\bref="[^"]*"', f'ref="{ref}"', start_tag), 1)
+    table_xml = re.sub(r'(<autoFilter\b[^>]*?\bref=")[^"]*(")', rf'\g<1>{ref}\g<2>', table_xml, count=1)
+    return re.sub(r'<sortState\b[^>]*?/>|<sortState\b.*?</sortState>', '', table_xml, flags=re.S)
+
+def _sheet_table_parts(archive, sheet_part):
+    """返回工作表中的表格 {显示名称: 表格部件路径}"""
+    tables = {}
+    for rel_type, target, _ in _read_relationships_full(archive, _rels_path(sheet_part)).values():
+        if rel_type == TABLE_REL_TYPE:
+            part = _resolve_target(sheet_part, target)
+            tables[_table_attr(archive.read(part).decode('utf-8'), 'displayName')] = part
+    return tables
+
+def read_sheet_tables(path, sheet_name):
+    """返回工作表中的表格 {显示名称: 范围}，工作表不存在时返回空字典"""
+    with zipfile.ZipFile(path) as archive:
+        sheet_part = find_sheet_part(archive, sheet_name)
+        if sheet_part is None:
+            return {}
+        return {name: _table_attr(archive.read(part).decode('utf-8'), 'ref')
+                for name, part in _sheet_table_parts(archive, sheet_part).items()}
+
+def patch_sheet(path, sheet_name, cells, hyperlinks, table_refs=None):
+    """替换一个工作表的全部单元格和超链接，其他内容不变
+
+    只重新生成该工作表XML中的 dimension、sheetData、hyperlinks 和该工作表的关系文件，
+    列宽、冻结窗格、工作表保护等设置保持原样；只有这些成员和修改了范围的表格重新压缩，
+    其他压缩包成员直接复制原有的压缩数据。
+    先写入临时文件，成功后再替换原文件。
+
+    Args:
+        cells: {(行, 列): SheetCell}
+        hyperlinks: SheetHyperlink 列表
+        table_refs: {表格显示名称: 新范围}，同时修改这些表格的范围
+
+    Returns:
+        是否成功修改（工作表不存在或XML结构无法识别时返回False，文件不变）
+    """
+    with zipfile.ZipFile(path) as archive:
+        sheet_part = find_sheet_part(archive, sheet_name)
+        if sheet_part is None:
+            return False
+        rels_part = _rels_path(sheet_part)
+        sheet_xml = archive.read(sheet_part).decode('utf-8')
+
+        # 保留超链接以外的关系（如绘图、表格），超链接关系重新生成
+        kept_rels = {rel_id: rel for rel_id, rel in _read_relationships_full(archive, rels_part).items()
+                     if rel[0] != HYPERLINK_REL_TYPE}
+        rel_lines = [f'<Relationship Id={quoteattr(rel_id)} Type={quoteattr(rel_type)} Target={quoteattr(target)}'
+                     + (f' TargetMode={quoteattr(mode)}' if mode else '') + '/>'
+                     for rel_id, (rel_type, target, mode) in kept_rels.items()]
+
+        link_parts = []
+        next_id = 1
+        for link in hyperlinks:
+            attrs = f'ref={quoteattr(link.ref)}'
+            if link.location:
+                attrs += f' location={quoteattr(link.location)}'
+            if link.display:
+                attrs += f' display={quoteattr(link.display)}'
+            if link.tooltip:
+                attrs += f' tooltip={quoteattr(link.tooltip)}'
+            if link.target:
+                while f'rId{next_id}' in kept_rels:
+                    next_id += 1
+                rel_id = f'rId{next_id}'
+                next_id += 1
+                attrs += f' r:id="{rel_id}"'
+                rel_lines.append(f'<Relationship Id="{rel_id}" Type="{HYPERLINK_REL_TYPE}" '
+                                 f'Target={quoteattr(link.target)} TargetMode="External"/>')
+            link_parts.append(f'<hyperlink xmlns:r="{REL_NS}" {attrs}/>')
+        links_xml = f'<hyperlinks>{"".join(link_parts)}</hyperlinks>' if link_parts else ''
+
+        if cells:
+            max_row = max(row for row, _ in cells)
+            max_col = max(col for _, col in cells)
+            dimension = f'<dimension ref="A1:{get_column_letter(max_col)}{max_row}"/>'
+        else:
+            dimension = '<dimension ref="A1"/>'
+
+        if not re.search(r'<sheetData\b', sheet_xml):
+            # 工作表元素使用了命名空间前缀等无法识别的写法
+            return False
+        new_xml = _replace_element(sheet_xml, 'sheetData', _sheet_data_xml(cells))
+        new_xml = _replace_element(new_xml, 'dimension', dimension,
+                                   before=('sheetViews', 'sheetFormatPr', 'cols', 'sheetData'))
+        new_xml = new_xml and _replace_element(new_xml, 'hyperlinks', links_xml, before=_AFTER_HYPERLINKS)
+        if new_xml is None:
+            return False
+        # 修改表格范围
+        new_parts = {}
+        if table_refs:
+            for name, part in _sheet_table_parts(archive, sheet_part).items():
+                if name in table_refs:
+                    table_xml = archive.read(part).decode('utf-8')
+                    new_parts[part] = _set_table_ref(table_xml, table_refs[name]).encode('utf-8')
+
+        rels_xml = None
+        if rel_lines:
+            rels_xml = (f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                        f'<Relationships xmlns="{PKG_REL_NS}">{"".join(rel_lines)}</Relationships>')
+
+        members = archive.infolist()
+        add_rels = rels_xml is not None and rels_part not in archive.NameToInfo
+
+    # 关闭原文件后再写入和替换（Windows上无法替换仍打开着的文件）
+    with atomic_open(path) as f, open(path, 'rb') as source, \
+            zipfile.ZipFile(f, 'w', zipfile.ZIP_DEFLATED) as output:
+        for info in members:
+            if info.filename == sheet_part:
+                output.writestr(info.filename, new_xml.encode('utf-8'))
+            elif info.filename == rels_part:
+                if rels_xml is not None:
+                    output.writestr(info.filename, rels_xml.encode('utf-8'))
+            elif info.filename in new_parts:
+                output.writestr(info.filename, new_parts[info.filename])
+            else:
+                _copy_member(source, info, output)
+        if add_rels:
+            output.writestr(rels_part, rels_xml.encode('utf-8'))
+    return True